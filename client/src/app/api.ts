@@ -1,5 +1,12 @@
-import { throttle } from "lodash";
-import { MusicSyncSettings, PlayerState, Scene } from "./models";
+import { cloneDeep, isEqual, throttle } from "lodash";
+import {
+  Frame,
+  LedState,
+  MusicSyncSettings,
+  PlayerState,
+  Scene,
+  SceneSummary,
+} from "./models";
 import { revalidateTag } from "next/cache";
 import { io, Socket } from "socket.io-client";
 
@@ -47,8 +54,19 @@ export async function getScene(sceneId: string): Promise<Scene> {
   return scene;
 }
 
-export async function getScenes(): Promise<Scene[]> {
-  const { scenes } = await fetchIt<{ scenes: Scene[] }>(`/scenes`);
+const SCENES_PAGE_SIZE = 100;
+
+export async function getScenes(): Promise<SceneSummary[]> {
+  // summaries only, the frames are loaded when a scene is opened
+  const scenes: SceneSummary[] = [];
+  let total = Infinity;
+  while (scenes.length < total) {
+    const page = await fetchIt<{ scenes: SceneSummary[]; total: number }>(
+      `/scenes/summary?limit=${SCENES_PAGE_SIZE}&offset=${scenes.length}`
+    );
+    scenes.push(...page.scenes);
+    total = page.scenes.length ? page.total : scenes.length;
+  }
 
   return scenes;
 }
@@ -72,14 +90,66 @@ export async function deleteScene(sceneId: string): Promise<void> {
   revalidateHomepage();
 }
 
+// a copy of the last version of every scene saved from here, later saves
+// only send what changed since. the editor clones its state on every action,
+// so everything is compared by value
+const savedScenes = new Map<string, Scene>();
+
+function changedLeds(before: Frame, after: Frame) {
+  const ledStates: { [led: string]: LedState | null } = {};
+  const leds = new Set([
+    ...Object.keys(before.ledStates),
+    ...Object.keys(after.ledStates),
+  ]);
+  leds.forEach((led) => {
+    const was = before.ledStates[led];
+    const is = after.ledStates[led];
+    if (was?.r !== is?.r || was?.g !== is?.g || was?.b !== is?.b) {
+      // null turns the LED off
+      ledStates[led] = is ?? null;
+    }
+  });
+
+  return ledStates;
+}
+
+async function patchScene(saved: Scene, scene: Scene): Promise<void> {
+  const metadata: Partial<Scene> = {};
+  for (const key of ["name", "fps", "brightness", "ledPositions"] as const) {
+    if (!isEqual(saved[key], scene[key])) {
+      Object.assign(metadata, { [key]: scene[key] });
+    }
+  }
+  if (Object.keys(metadata).length) {
+    await fetchIt(`/scenes/${scene.id}`, { method: "PATCH" }, metadata);
+  }
+
+  for (const [frameNum, frame] of scene.frames.entries()) {
+    const ledStates = changedLeds(saved.frames[frameNum], frame);
+    if (Object.keys(ledStates).length) {
+      await fetchIt(
+        `/scenes/${scene.id}/frames/${frameNum}`,
+        { method: "PATCH" },
+        { ledStates }
+      );
+    }
+  }
+}
+
 export async function saveScene(scene: Scene): Promise<void> {
-  await fetchIt(
-    `/scenes/${scene.id}`,
-    {
-      method: "PUT",
-    },
-    scene
-  );
+  const saved = savedScenes.get(scene.id);
+  if (saved && saved.frames.length === scene.frames.length) {
+    await patchScene(saved, scene);
+  } else {
+    await fetchIt(
+      `/scenes/${scene.id}`,
+      {
+        method: "PUT",
+      },
+      scene
+    );
+  }
+  savedScenes.set(scene.id, cloneDeep(scene));
   revalidateHomepage();
 }
 
@@ -20,6 +20,16 @@ export type Scene = {
   brightness: number;
 };
 
+export type SceneSummary = {
+  id: string;
+  name: string;
+  fps: number;
+  frameCount: number;
+  locked: boolean;
+  // distinct colors of the first frame
+  preview: string[];
+};
+
 export type Program = {
   id: string;
   name: string;
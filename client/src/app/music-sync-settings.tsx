@@ -5,6 +5,19 @@ import { Container, Label } from "./components";
 import { IconButton } from "./icons/icons";
 import { MusicSyncSettings } from "./models";
 
+function readSettings(form: HTMLFormElement) {
+  const formData = new FormData(form);
+  return {
+    activationThreshold: Number(formData.get("activationThreshold")),
+    transitionScale: Number(formData.get("transitionScale")),
+    lowRangeColorScale: Number(formData.get("lowRangeColorScale")),
+    midRangeColorScale: Number(formData.get("midRangeColorScale")),
+    highRangeColorScale: Number(formData.get("highRangeColorScale")),
+    lowRange: Number(formData.get("lowRange")),
+    midRange: Number(formData.get("midRange")),
+  };
+}
+
 export default function MusicSyncSettings({
   settings,
 }: {
@@ -15,22 +28,24 @@ export default function MusicSyncSettings({
     <Container border>
       <h1>Sync Music</h1>
       <form
+        onChange={(event) => {
+          // saved settings are applied to a running sync right away
+          const form = event.currentTarget;
+          if (!form.checkValidity()) return;
+
+          setMusicSyncSettings({
+            ...settings,
+            ...readSettings(form),
+          });
+        }}
         onSubmit={(event) => {
           event.preventDefault();
           if (loading) return;
 
           setLoading(true);
-          const formData = new FormData(event.target as HTMLFormElement);
-          const data = {
-            activationThreshold: Number(formData.get("activationThreshold")),
-            lowRangeColorScale: Number(formData.get("lowRangeColorScale")),
-            midRangeColorScale: Number(formData.get("midRangeColorScale")),
-            highRangeColorScale: Number(formData.get("highRangeColorScale")),
-          };
-
           setMusicSyncSettings({
             ...settings,
-            ...data,
+            ...readSettings(event.target as HTMLFormElement),
           })
             .then(() => {
               syncMusic();
@@ -103,22 +118,22 @@ export default function MusicSyncSettings({
             defaultValue={settings.lowRangeColorScale}
           />
         </Label>
-        <Label label="low range" direction="col">
+        <Label label="low range (Hz)" direction="col">
           <input
             type="number"
-            min={0}
-            max={200}
+            min={20}
+            max={2000}
             step={10}
             name="lowRange"
             defaultValue={settings.lowRange}
           />
         </Label>
-        <Label label="mid range" direction="col">
+        <Label label="mid range (Hz)" direction="col">
           <input
             type="number"
-            min={100}
-            max={1024}
-            step={10}
+            min={200}
+            max={24000}
+            step={100}
             name="midRange"
             defaultValue={settings.midRange}
           />
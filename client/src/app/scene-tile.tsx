@@ -3,12 +3,20 @@
 import { copyScene, deleteScene, playScene } from "./api";
 import { Tile } from "./components";
 import { IconButton, LinkIcon } from "./icons/icons";
-import { Scene } from "./models";
+import { SceneSummary } from "./models";
 
-export default function SceneTile({ scene }: { scene: Scene }) {
+export default function SceneTile({ scene }: { scene: SceneSummary }) {
   return (
     <Tile key={scene.id}>
       <h3>{scene.name || `Untitled Scene ${scene.id}`}</h3>
+      <div className="flex flex-row h-2 my-1">
+        {scene.preview.map((color) => (
+          <div key={color} className="flex-1" style={{ backgroundColor: color }} />
+        ))}
+      </div>
+      <p className="text-sm">
+        {scene.frameCount} frames @ {scene.fps} fps
+      </p>
       <div className="flex flex-row flex-wrap">
         <IconButton
           name="play_arrow"
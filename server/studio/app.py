@@ -1,82 +1,38 @@
+import binascii
 import logging
+import os
 import subprocess
+import zlib
 
 logging.basicConfig(level=logging.DEBUG)
 root_logger = logging.getLogger()
 root_logger.addHandler(logging.FileHandler("logs.txt", mode="a"))
 
-from collections import namedtuple
+from dataclasses import asdict
 from multiprocessing import current_process
-import sqlite3
-from flask import Flask, jsonify, request
-from json import dumps, loads
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_socketio import SocketIO
-from .scene_player import MusicSyncSettings, ScenePlayer
-from .models import Frame
+from . import db
+from .audio import SAMPLE_RATE
+from .db import get_db
+from .layout import get_layout
+from .library import export_library, import_library
+from .beats import load_wav
+from .scene_player import ScenePlayer
+from .tracks import analyze_track, delete_track, load_track, save_track
+from .virtual import FrameCapture
+from .models import Frame, MusicSyncSettings
 import studio.programs
 from werkzeug.exceptions import BadRequest
 
 app = Flask(__name__)
+db.init_app(app)
 player = None
 socketio = SocketIO(app, cors_allowed_origins="*", allow_unsafe_werkzeug=True)
 
-SceneQueryResult = namedtuple("Scene", ["id", "data"])
 logger = logging.getLogger(__name__)
 
 
-def init_db():
-    logger.debug("creating database")
-    con = sqlite3.connect("studio.db")
-    cur = con.cursor()
-    cur.execute(
-        "CREATE TABLE IF NOT EXISTS scenes (id INTEGER PRIMARY KEY, data JSON NOT NULL)"
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS music_sync_settings
-            (
-                id INTEGER PRIMARY KEY,
-                activation_threshold FLOAT NOT NULL,
-                transition_scale FLOAT NOT NULL,
-                low_range_color_scale FLOAT NOT NULL,
-                mid_range_color_scale FLOAT NOT NULL,
-                high_range_color_scale FLOAT NOT NULL,
-                low_range INTEGER NOT NULL,
-                mid_range INTEGER NOT NULL
-            )
-        """
-    )
-    con.commit()
-
-    try:
-        cur = con.cursor()
-        cur.execute("ALTER TABLE scenes ADD COLUMN locked INTEGER DEFAULT 0")
-        con.commit()
-    except Exception:
-        pass
-
-    try:
-        cur = con.cursor()
-        cur.execute(
-            """
-                INSERT INTO music_sync_settings (
-                    id,
-                    activation_threshold,
-                    transition_scale,
-                    low_range_color_scale,
-                    mid_range_color_scale,
-                    high_range_color_scale,
-                    low_range,
-                    mid_range
-                ) VALUES (0, 0.2, 0.2, 1.0, 1.0, 1.0, 50, 500)
-            """)
-        con.commit()
-    except Exception:
-        pass
-
-    logger.debug("database created")
-
-
 @app.after_request
 def add_cors_headers(response):
     response.headers["Access-Control-Allow-Origin"] = "*"
@@ -85,70 +41,98 @@ def add_cors_headers(response):
     return response
 
 
-def get_last_scene_id(cur: sqlite3.Cursor) -> None:
-    res = cur.execute("SELECT id FROM scenes ORDER BY id DESC LIMIT 1").fetchone()
-    if res:
-        return res[0]
-
-    return -1
-
-
-def get_scene_by_id(cur: sqlite3.Cursor, scene_id: int) -> SceneQueryResult | None:
-    res = cur.execute(
-        "SELECT id, data FROM scenes WHERE id = ?", (scene_id,)
-    ).fetchone()
-    if res:
-        id_ = res[0]
-        data = loads(res[1])
-        data["id"] = id_
-        scene = SceneQueryResult(id_, data)
-
-        return scene
+# conditional GETs: scene responses carry a strong ETag of the scene's
+# version, listings one of the library version. A client that already has
+# the current one gets a 304 before anything is loaded
+def not_modified(etag: str):
+    """
+    A 304 response if the request's If-None-Match has `etag`, otherwise None.
+    """
+    if request.if_none_match.contains(etag):
+        return with_etag(app.response_class(status=304), etag)
 
     return None
 
 
-def get_scenes(cur: sqlite3.Cursor) -> list[SceneQueryResult]:
-    scenes = []
-    for row in cur.execute("SELECT id, data FROM scenes").fetchall():
-        id_ = row[0]
-        data = loads(row[1])
-        data["id"] = id_
-        scene = SceneQueryResult(id_, data)
-        scenes.append(scene)
+def with_etag(response, etag: str):
+    response.set_etag(etag)
+    # caches may keep it but have to check back every time
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
 
-    return scenes
+def library_etag(cur) -> str:
+    return f"library-{db.get_library_version(cur)}"
 
 
 # SCENES CRUd
 @app.route("/api/scenes", methods=["GET"])
 def list_scenes():
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    scenes = get_scenes(cur)
-    return jsonify({"scenes": [scene.data for scene in scenes]})
+    # read before the scenes: a change in between makes the tag too old,
+    # which only costs a refetch, never too new
+    etag = library_etag(cur)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    scenes = db.get_scenes(cur)
+    return with_etag(jsonify({"scenes": [scene.data for scene in scenes]}), etag)
+
+
+@app.route("/api/scenes/summary", methods=["GET"])
+def list_scene_summaries():
+    # what the scene tiles need, without loading any frames
+    limit = request.args.get("limit", 50, type=int)
+    offset = request.args.get("offset", 0, type=int)
+    if limit < 1 or limit > 500 or offset < 0:
+        raise BadRequest("limit must be between 1 and 500 and offset positive")
+
+    con = get_db()
+    cur = con.cursor()
+    etag = library_etag(cur)
+    response = not_modified(etag)
+    if response:
+        return response
+
+    return with_etag(
+        jsonify({
+            "scenes": db.get_scene_summaries(cur, limit, offset),
+            "total": db.count_scenes(cur),
+        }),
+        etag,
+    )
 
 
 @app.route("/api/scenes/<int:scene_id>", methods=["GET"])
 def get_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    scene = get_scene_by_id(cur, scene_id)
+    version = db.get_scene_version(cur, scene_id)
+    if version is None:
+        return jsonify({"error": "Scene not found"}), 404
+
+    response = not_modified(f"{scene_id}-{version}")
+    if response:
+        return response
+
+    scene = db.get_scene_by_id(cur, scene_id)
     if scene:
-        return jsonify({"scene": scene.data})
+        return with_etag(jsonify({"scene": scene.data}), f"{scene_id}-{scene.version}")
     else:
         return jsonify({"error": "Scene not found"}), 404
 
 
 @app.route("/api/scenes", methods=["POST"])
 def create_scene():
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
     data = request.get_json()
 
-    next_id = get_last_scene_id(cur) + 1
+    next_id = db.get_last_scene_id(cur) + 1
 
     data = {
         "id": next_id,
@@ -159,13 +143,7 @@ def create_scene():
         "brightness": 20,
     }
 
-    cur.execute(
-        "INSERT INTO scenes (id, data) VALUES (?,?)",
-        (
-            next_id,
-            dumps(data),
-        ),
-    )
+    db.insert_scene(cur, next_id, data)
     con.commit()
 
     return jsonify({"id": next_id})
@@ -173,23 +151,100 @@ def create_scene():
 
 @app.route("/api/scenes/<int:scene_id>", methods=["PUT"])
 def update_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
     data = request.get_json()
-    cur.execute(
-        "UPDATE scenes SET data = ? WHERE id = ?", (dumps(data), scene_id)
-    ).fetchone()
+    db.update_scene(cur, scene_id, data)
     con.commit()
-    return jsonify({"id": scene_id})
+    return jsonify({"id": scene_id, "version": db.get_scene_version(cur, scene_id)})
+
+
+# SCENE patches, each changes only part of a scene and returns its new version
+def apply_patch(scene_id: int, patch):
+    """
+    Runs `patch(cur)`, one of the `db` patch functions, and commits it.
+    """
+    con = get_db()
+    cur = con.cursor()
+
+    try:
+        version = patch(cur)
+    except IndexError as e:
+        return jsonify({"error": str(e)}), 404
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise BadRequest(f"invalid patch: {e}")
+
+    if version is None:
+        return jsonify({"error": "Scene not found"}), 404
+
+    con.commit()
+    return jsonify({"id": scene_id, "version": version})
+
+
+@app.route("/api/scenes/<int:scene_id>", methods=["PATCH"])
+def patch_scene(scene_id):
+    # name, fps, brightness... the frames have their own routes
+    changes = request.get_json()
+    if not isinstance(changes, dict) or "frames" in changes or "id" in changes:
+        raise BadRequest("expected an object of scene fields other than id and frames")
+
+    return apply_patch(scene_id, lambda cur: db.update_scene_metadata(cur, scene_id, changes))
+
+
+@app.route("/api/scenes/<int:scene_id>/frames/<int:frame_num>", methods=["PATCH"])
+def patch_frame(scene_id, frame_num):
+    # {"ledStates": {"12": {"r": 255, "g": 0, "b": 0}, "13": null}}
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get("ledStates"), dict):
+        raise BadRequest("expected an object with ledStates")
+
+    return apply_patch(
+        scene_id, lambda cur: db.update_frame_leds(cur, scene_id, frame_num, data["ledStates"])
+    )
+
+
+@app.route("/api/scenes/<int:scene_id>/frames", methods=["POST"])
+def insert_frame(scene_id):
+    # {"frame": {"ledStates": {...}}, "index": 3}, without an index the frame
+    # is appended
+    data = request.get_json()
+    if (
+        not isinstance(data, dict)
+        or not isinstance(data.get("frame"), dict)
+        or not isinstance(data["frame"].get("ledStates"), dict)
+    ):
+        raise BadRequest("expected an object with a frame and its ledStates")
+
+    return apply_patch(
+        scene_id,
+        lambda cur: db.insert_frame(cur, scene_id, data["frame"], data.get("index")),
+    )
+
+
+@app.route("/api/scenes/<int:scene_id>/frames/<int:frame_num>", methods=["DELETE"])
+def delete_frame(scene_id, frame_num):
+    return apply_patch(scene_id, lambda cur: db.delete_frame(cur, scene_id, frame_num))
+
+
+@app.route("/api/scenes/<int:scene_id>/frames/<int:frame_num>/move", methods=["POST"])
+def move_frame(scene_id, frame_num):
+    # {"to": 0}
+    data = request.get_json()
+    if not isinstance(data, dict) or not isinstance(data.get("to"), int):
+        raise BadRequest("expected an object with the frame number to move to")
+
+    return apply_patch(
+        scene_id, lambda cur: db.move_frame(cur, scene_id, frame_num, data["to"])
+    )
 
 
 @app.route("/api/scenes/<int:scene_id>", methods=["DELETE"])
 def delete_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    cur.execute("DELETE FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    db.delete_scene(cur, scene_id)
     con.commit()
     return jsonify({})
 
@@ -197,34 +252,84 @@ def delete_scene(scene_id):
 # SCENE Commands
 @app.route("/api/scenes/<int:scene_id>/play", methods=["POST"])
 def play_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    scene = get_scene_by_id(cur, scene_id)
-    if scene:
-        player.play_scene(scene.data)
-        return jsonify({})
+    scene = db.get_scene_metadata(cur, scene_id)
+    if not scene:
+        return jsonify({"error": "Scene not found"}), 404
+
+    track = load_track(cur, scene_id) if scene.data.get("type") == "music" else None
+    if track:
+        player.play_track(scene.data, track, db.get_music_sync_settings(cur))
     else:
+        # the frames are only read if the player doesn't have this version
+        player.play_scene(
+            scene.data,
+            version=scene.version,
+            load_frames=lambda: db.get_scene_frames(cur, scene_id),
+        )
+    return jsonify({})
+
+
+@app.route("/api/scenes/<int:scene_id>/track", methods=["GET"])
+def get_scene_track(scene_id):
+    con = get_db()
+    cur = con.cursor()
+
+    track = load_track(cur, scene_id)
+    if not track:
+        return jsonify({"error": "Scene has no track"}), 404
+
+    return jsonify({
+        "duration": track.duration,
+        "bpm": track.bpm,
+        "beats": track.beats.tolist(),
+    })
+
+
+@app.route("/api/scenes/<int:scene_id>/track", methods=["PUT"])
+def set_scene_track(scene_id):
+    """
+    Takes a WAV file, either as the request body or as the "file" field of a
+    form, and stores its feature track on the scene.
+    """
+    con = get_db()
+    cur = con.cursor()
+
+    if not db.scene_exists(cur, scene_id):
         return jsonify({"error": "Scene not found"}), 404
 
+    wav = request.files["file"].stream if "file" in request.files else request.stream
+    try:
+        samples, sample_rate = load_wav(wav)
+    except Exception as e:
+        raise BadRequest(f"not a PCM WAV file: {e}")
+
+    track = analyze_track(samples, sample_rate, db.get_music_sync_settings(cur))
+    save_track(cur, scene_id, track)
+    con.commit()
+    return jsonify({"duration": track.duration, "bpm": track.bpm})
+
+
+@app.route("/api/scenes/<int:scene_id>/track", methods=["DELETE"])
+def delete_scene_track(scene_id):
+    con = get_db()
+    cur = con.cursor()
+
+    delete_track(cur, scene_id)
+    db.set_scene_type(cur, scene_id, "loop")
+    con.commit()
+    return jsonify({})
+
 
 @app.route("/api/scenes/<int:scene_id>/copy", methods=["POST"])
 def copy_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    scene = get_scene_by_id(cur, scene_id)
-    if scene:
-        data = scene.data
-        next_id = get_last_scene_id(cur) + 1
-        data["id"] = next_id
-        cur.execute(
-            "INSERT INTO scenes (id, data) VALUES (?,?)",
-            (
-                next_id,
-                dumps(data),
-            ),
-        )
+    next_id = db.get_last_scene_id(cur) + 1
+    if db.copy_scene(cur, scene_id, next_id):
         con.commit()
         return jsonify({"id": next_id})
     else:
@@ -233,24 +338,61 @@ def copy_scene(scene_id):
 
 @app.route("/api/scenes/<int:scene_id>/lock", methods=["POST"])
 def lock_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    cur.execute("UPDATE scenes SET locked = 1 WHERE id = ?", (scene_id,)).fetchone()
+    db.set_scene_locked(cur, scene_id, True)
     con.commit()
     return jsonify({})
 
 
 @app.route("/api/scenes/<int:scene_id>/unlock", methods=["POST"])
 def unlock_scene(scene_id):
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
-    cur.execute("UPDATE scenes SET locked = 0 WHERE id = ?", (scene_id,)).fetchone()
+    db.set_scene_locked(cur, scene_id, False)
     con.commit()
     return jsonify({})
 
 
+# LIBRARY, see studio.library
+@app.route("/api/library/export", methods=["GET"])
+def export_scene_library():
+    con = get_db()
+    cur = con.cursor()
+
+    # streamed: scenes are read from the database as the response is sent
+    return Response(
+        stream_with_context(export_library(cur)),
+        mimetype="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=library.ndjson"},
+    )
+
+
+@app.route("/api/library/import", methods=["POST"])
+def import_scene_library():
+    """
+    Takes an export as the request body and imports it all or nothing. With
+    ?mode=append the scenes get new ids, by default they replace scenes with
+    the same id.
+    """
+    mode = request.args.get("mode", "replace")
+    if mode not in ("replace", "append"):
+        raise BadRequest("mode must be replace or append")
+
+    con = get_db()
+    cur = con.cursor()
+    try:
+        count = import_library(cur, request.stream, mode)
+    except (ValueError, zlib.error, binascii.Error) as e:
+        con.rollback()
+        raise BadRequest(f"invalid library: {e}")
+
+    con.commit()
+    return jsonify({"imported": count})
+
+
 # PLAYER Controls
 @app.route("/api/player", methods=["GET"])
 def get_scene_state():
@@ -283,16 +425,40 @@ def stop():
     return jsonify({})
 
 
+@app.route("/api/player/stats", methods=["GET"])
+def get_player_stats():
+    return jsonify(player.get_stats())
+
+
+@app.route("/api/player/capture", methods=["GET"])
+def get_player_capture():
+    # frames recorded by a virtual strip, see studio.virtual
+    strips = get_layout().strips
+    strip_num = request.args.get("strip", 0, type=int)
+    count = request.args.get("count", 60, type=int)
+    if strip_num < 0 or strip_num >= len(strips) or not strips[strip_num].capture:
+        return jsonify({"error": "Strip has no capture"}), 404
+
+    try:
+        capture = FrameCapture(strips[strip_num].capture)
+    except FileNotFoundError:
+        return jsonify({"error": "Nothing captured yet"}), 404
+
+    timestamps, frames = capture.read(count)
+    capture.close()
+    return jsonify({"timestamps": timestamps.tolist(), "frames": frames.tolist()})
+
+
 @app.route("/api/player/show-frame", methods=["POST"])
 def show_frame():
-    con = sqlite3.connect("studio.db")
+    con = get_db()
     cur = con.cursor()
 
     data = request.get_json()
     scene_id = data["sceneId"]
     frame_num = data["frameNum"]
 
-    scene = get_scene_by_id(cur, scene_id)
+    scene = db.get_scene_by_id(cur, scene_id)
     if scene:
         player.show_frame(scene.data, frame_num)
         return jsonify({})
@@ -314,18 +480,9 @@ def start_program(program_name):
 
 @app.route("/api/sync-music/settings", methods=["GET"])
 def get_sync_music_settings():
-    con = sqlite3.connect("studio.db")
-    con.row_factory = sqlite3.Row
+    con = get_db()
     cur = con.cursor()
-    settings = cur.execute(
-        """
-        select * from music_sync_settings WHERE id = 0;
-        """).fetchone()
-    return jsonify({
-        key: settings[key]
-        for key in settings.keys()
-        if key != "id"
-    })
+    return jsonify(asdict(db.get_music_sync_settings(cur)))
 
 @app.route("/api/sync-music/settings", methods=["PUT"])
 def set_sync_music_settings():
@@ -335,53 +492,35 @@ def set_sync_music_settings():
     if data.activation_threshold < 0 or data.activation_threshold > 1:
         raise BadRequest("activation_threshold must be between 0 and 1")
     
-    if data.low_range < 1 or data.low_range > 1024:
-        raise BadRequest("low_range must be between 0 and 1024")
+    # band edges are in Hz and can't go past the nyquist frequency
+    if data.low_range < 1 or data.low_range >= SAMPLE_RATE // 2 - 1:
+        raise BadRequest(f"low_range must be between 1 and {SAMPLE_RATE // 2 - 2} Hz")
     
-    if data.mid_range < data.low_range or data.mid_range > 1024:
-        raise BadRequest("mid_range must be greater than low_range")
+    if data.mid_range <= data.low_range or data.mid_range >= SAMPLE_RATE // 2:
+        raise BadRequest(
+            f"mid_range must be greater than low_range and below {SAMPLE_RATE // 2} Hz"
+        )
     
-    con = sqlite3.connect("studio.db")
-    con.row_factory = sqlite3.Row
+    con = get_db()
     cur = con.cursor()
-    cur.execute(
-        """
-        UPDATE music_sync_settings SET
-            activation_threshold = ?,
-            transition_scale = ?,
-            low_range_color_scale = ?,
-            mid_range_color_scale = ?,
-            high_range_color_scale = ?,
-            low_range = ?,
-            mid_range = ?
-        WHERE id = 0;
-        """, (
-            data.activation_threshold,
-            data.transition_scale,
-            data.low_range_color_scale,
-            data.mid_range_color_scale,
-            data.high_range_color_scale,
-            data.low_range,
-            data.mid_range
-        ))
+    db.update_music_sync_settings(cur, data)
     con.commit()
+
+    # takes effect right away if music sync is running
+    player.update_music_settings(data)
     return jsonify({})
 
+@app.route("/api/sync-music/latency", methods=["GET"])
+def get_sync_music_latency():
+    return jsonify(player.get_latency())
+
+
 @app.route("/api/sync-music", methods=["POST"])
 def sync_music():
-    con = sqlite3.connect("studio.db")
-    con.row_factory = sqlite3.Row
+    con = get_db()
     cur = con.cursor()
-    settings = cur.execute(
-        """
-        select * from music_sync_settings WHERE id = 0;
-        """).fetchone()
-
-    player.sync_music(MusicSyncSettings(**{
-        key: settings[key]
-        for key in settings.keys()
-        if key != "id"
-    }))
+
+    player.sync_music(db.get_music_sync_settings(cur))
     return jsonify({})
 
 
@@ -404,6 +543,13 @@ def handle_set_leds_event(json):
 
 
 if __name__ == "__main__":
-    player = ScenePlayer()
-    init_db()
+    with db.pool.connection() as con:
+        db.init_db(con)
+        music_settings = db.get_music_sync_settings(con.cursor())
+
+    # "drop" or "catch_up", see studio.scheduler
+    player = ScenePlayer(
+        frame_policy=os.environ.get("FRAME_POLICY", "drop"),
+        music_settings=music_settings,
+    )
     app.run(host="0.0.0.0", port=5000, use_reloader=False)
@@ -0,0 +1,169 @@
+"""
+Audio analysis for music sync.
+"""
+from time import monotonic
+
+import numpy as np
+
+SAMPLE_RATE = 48000
+SAMPLE_SIZE = 1024
+
+
+class AudioRingBuffer:
+    """
+    Ring buffer of mono samples filled from the audio callback.
+
+    There is a single writer (the audio thread) and a single reader (the render
+    loop), so no locks are needed: the writer only advances `written` once the
+    samples are in place, and the reader copies the window that ends there.
+    The render loop always analyzes the most recent audio and never blocks on
+    the device, no matter how long a frame takes.
+    """
+
+    def __init__(self, capacity: int = SAMPLE_RATE, sample_rate: int = SAMPLE_RATE):
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self._buffer = np.zeros(capacity, dtype=np.float32)
+        # total number of samples ever written
+        self.written = 0
+        # monotonic() when the last sample written was captured
+        self.captured_at = 0.0
+
+    def write(self, samples: np.ndarray):
+        samples = samples[-self.capacity:]
+        start = self.written % self.capacity
+        end = start + len(samples)
+        if end <= self.capacity:
+            self._buffer[start:end] = samples
+        else:
+            split = self.capacity - start
+            self._buffer[start:] = samples[:split]
+            self._buffer[:end - self.capacity] = samples[split:]
+
+        self.written += len(samples)
+
+    def callback(self, indata: np.ndarray, frames: int, time, status):
+        """
+        `sd.InputStream` callback, keeps the first channel.
+        """
+        self.write(indata[:, 0])
+
+        captured_at = monotonic()
+        # the device tells when the block started on its own clock, move that
+        # to ours. not every host API fills it in
+        adc_time = getattr(time, "inputBufferAdcTime", 0)
+        if adc_time:
+            captured_at -= time.currentTime - adc_time - frames / self.sample_rate
+        self.captured_at = captured_at
+
+    def read_latest(self, out: np.ndarray) -> np.ndarray:
+        """
+        Fills `out` with the most recent `len(out)` samples, oldest first.
+        """
+        return self.read_window(self.written, out)
+
+    def read_window(self, end: int, out: np.ndarray) -> np.ndarray:
+        """
+        Fills `out` with the `len(out)` samples before sample number `end`,
+        which has to be within the last `capacity` samples written.
+        """
+        count = len(out)
+        end = end % self.capacity
+        start = end - count
+        if start >= 0:
+            out[:] = self._buffer[start:end]
+        else:
+            out[:-start] = self._buffer[start:]
+            out[-start:] = self._buffer[:end]
+
+        return out
+
+
+class BandAnalyzer:
+    """
+    Splits a window of audio into bass, mid and treble volumes.
+
+    Everything that only depends on the settings and the sample rate is done
+    once up front: the window function, the Hz band edges converted into rfft
+    bin ranges and the buffers `analyze` works in. `settings.low_range` and
+    `settings.mid_range` are the band edges in Hz, so they mean the same thing
+    at any sample rate.
+    """
+
+    def __init__(
+        self,
+        settings,
+        sample_rate: int = SAMPLE_RATE,
+        sample_size: int = SAMPLE_SIZE,
+    ):
+        self.settings = settings
+        self.sample_rate = sample_rate
+        self.sample_size = sample_size
+        self.window = np.hanning(sample_size).astype(np.float32)
+
+        # band edges as bin indexes, skipping the DC bin, every band keeps at
+        # least one bin even for edges at or past the nyquist frequency
+        freqs = np.fft.rfftfreq(sample_size, 1 / sample_rate)
+        low, mid = np.searchsorted(freqs, (settings.low_range, settings.mid_range))
+        low = min(max(int(low), 2), len(freqs) - 2)
+        mid = min(max(int(mid), low + 1), len(freqs) - 1)
+        self.bands = ((1, low), (low, mid), (mid, len(freqs)))
+
+        # input window for callers that read into it, see AudioRingBuffer
+        self.samples = np.zeros(sample_size, dtype=np.float32)
+        self._windowed = np.empty(sample_size, dtype=np.float32)
+        self.amplitudes = np.zeros(len(freqs), dtype=np.float32)
+        # bass, mid and treble volume of the last window, between 0 and 1
+        self.volumes = np.zeros(3, dtype=np.float32)
+
+    def analyze(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Analyzes a mono window of `sample_size` samples and returns the volumes
+        of the three bands. The returned array is reused between calls.
+        """
+        np.multiply(samples, self.window, out=self._windowed)
+        np.abs(np.fft.rfft(self._windowed), out=self.amplitudes)
+
+        for band, (start, end) in enumerate(self.bands):
+            amplitudes = self.amplitudes[start:end]
+            low, high = amplitudes.min(), amplitudes.max()
+            # the mean of the band after min/max normalizing it
+            self.volumes[band] = (
+                (amplitudes.mean() - low) / (high - low) if high > low else 0
+            )
+
+        return self.volumes
+
+
+class LogBands:
+    """
+    Sums an rfft magnitude spectrum into `n_bands` log spaced bands, which is
+    closer to how pitch is heard than the linear rfft bins. Every band covers
+    at least one bin.
+    """
+
+    def __init__(
+        self,
+        n_bands: int,
+        sample_rate: int = SAMPLE_RATE,
+        sample_size: int = SAMPLE_SIZE,
+        low: float = 40,
+    ):
+        freqs = np.fft.rfftfreq(sample_size, 1 / sample_rate)
+        edges = np.geomspace(low, sample_rate / 2, n_bands + 1)
+        # first bin of every band, skipping DC and pushed up where low bands
+        # would otherwise share a bin
+        offsets = np.arange(n_bands)
+        starts = np.maximum(np.searchsorted(freqs, edges[:-1]), 1)
+        self.starts = np.maximum.accumulate(starts - offsets) + offsets
+        self.widths = np.diff(self.starts, append=len(freqs)).astype(np.float32)
+        self.energies = np.zeros(n_bands, dtype=np.float32)
+
+    def analyze(self, amplitudes: np.ndarray) -> np.ndarray:
+        """
+        Returns the log compressed mean magnitude of every band. The returned
+        array is reused between calls.
+        """
+        np.add.reduceat(amplitudes, self.starts, out=self.energies)
+        np.divide(self.energies, self.widths, out=self.energies)
+        return np.log1p(self.energies, out=self.energies)
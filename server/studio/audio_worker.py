@@ -0,0 +1,172 @@
+"""
+Audio capture and analysis in a process of its own.
+
+The worker owns the input stream, runs the band analysis and beat detection on
+every hop of audio as it arrives and publishes the results as `AudioFeatures`
+(see studio.features). The player process only copies the newest record, so a
+slow analysis never stalls the LEDs and any render mode can react to the music
+without doing FFTs itself.
+"""
+import logging
+from multiprocessing import Event, Process, Queue
+from queue import Empty
+from threading import Event as ThreadEvent
+from time import monotonic
+
+import numpy as np
+import sounddevice as sd
+
+from studio.audio import SAMPLE_RATE, SAMPLE_SIZE, AudioRingBuffer, BandAnalyzer, LogBands
+from studio.beats import HOP_SIZE, BeatDetector, BeatTracker
+from studio.features import N_BANDS, AudioFeatures
+
+logger = logging.getLogger(__name__)
+
+
+def beat_tracker(audio: AudioRingBuffer, settings) -> BeatTracker:
+    """
+    `settings` is a `MusicSyncSettings`: the band edges configure the analyzer
+    and `activation_threshold` the onset sensitivity.
+    """
+    analyzer = BandAnalyzer(settings, SAMPLE_RATE, SAMPLE_SIZE)
+    detector = BeatDetector(
+        SAMPLE_RATE / HOP_SIZE,
+        sensitivity=settings.activation_threshold * 10,
+    )
+    return BeatTracker(audio, analyzer, detector)
+
+
+class AudioAnalysis:
+    """
+    Turns the audio in a ring buffer into feature records.
+    """
+
+    def __init__(self, audio: AudioRingBuffer, settings):
+        self.audio = audio
+        self.tracker = beat_tracker(audio, settings)
+        self.bands = LogBands(N_BANDS, SAMPLE_RATE, SAMPLE_SIZE)
+        self.features = AudioFeatures.empty()
+
+    def update_settings(self, settings):
+        """
+        Applies new settings without losing the audio or the beat history.
+        """
+        analyzer = self.tracker.analyzer
+        if (settings.low_range, settings.mid_range) != (
+            analyzer.settings.low_range,
+            analyzer.settings.mid_range,
+        ):
+            # the band edges are baked into the analyzer's bin ranges
+            new_analyzer = BandAnalyzer(settings, SAMPLE_RATE, SAMPLE_SIZE)
+            new_analyzer.samples[:] = analyzer.samples
+            new_analyzer.amplitudes[:] = analyzer.amplitudes
+            self.tracker.analyzer = new_analyzer
+        else:
+            analyzer.settings = settings
+
+        self.tracker.detector.sensitivity = settings.activation_threshold * 10
+
+    def update(self) -> np.ndarray:
+        """
+        Analyzes the audio captured since the last call and returns the
+        updated record. The returned record is reused between calls.
+        """
+        self.tracker.update()
+        analyzer = self.tracker.analyzer
+        detector = self.tracker.detector
+        samples = analyzer.samples
+        features = self.features
+
+        captured_at = self.audio.captured_at
+        features["captured_at"] = captured_at
+        features["rms"] = np.sqrt(np.dot(samples, samples) / len(samples))
+        features["peak"] = np.abs(samples).max()
+        features["bass"], features["mid"], features["treble"] = analyzer.volumes
+        features["flux"] = detector.flux
+        features["bpm"] = detector.bpm
+        features["beat_count"] = detector.beat_count
+        if detector.last_beat is not None:
+            # detector times count samples, convert them to the monotonic clock
+            ago = self.audio.written / analyzer.sample_rate - detector.last_beat
+            features["last_beat"] = captured_at - ago
+        features["spectrum"] = self.bands.analyze(analyzer.amplitudes)
+        features["analyzed_at"] = monotonic()
+
+        return features
+
+
+def _audio_worker(
+    features: AudioFeatures,
+    settings,
+    settings_queue: Queue,
+    stopping,
+    blocksize: int,
+    stream,
+):
+    audio = AudioRingBuffer()
+    analysis = AudioAnalysis(audio, settings)
+    arrived = ThreadEvent()
+
+    def callback(indata, frames, time, status):
+        audio.callback(indata, frames, time, status)
+        arrived.set()
+
+    stream = stream(
+        device=0,
+        channels=1,
+        samplerate=SAMPLE_RATE,
+        blocksize=blocksize,
+        callback=callback,
+    )
+    with stream:
+        while not stopping.is_set():
+            if not arrived.wait(0.5):
+                continue
+
+            arrived.clear()
+            while True:
+                try:
+                    analysis.update_settings(settings_queue.get_nowait())
+                except Empty:
+                    break
+
+            features.write(analysis.update())
+
+
+class AudioWorker:
+    """
+    Runs `_audio_worker` until `stop` is called. `stream` replaces
+    `sd.InputStream`, see studio.latency.
+    """
+
+    def __init__(
+        self,
+        features: AudioFeatures,
+        settings,
+        blocksize: int = HOP_SIZE,
+        stream=sd.InputStream,
+    ):
+        self._stopping = Event()
+        self._settings = Queue()
+        self._proc = Process(
+            target=_audio_worker,
+            args=(features, settings, self._settings, self._stopping, blocksize, stream),
+            daemon=True,
+        )
+        self._proc.start()
+
+    def is_alive(self) -> bool:
+        return self._proc.is_alive()
+
+    def update_settings(self, settings):
+        """
+        Hands new settings to the running worker, the input stream stays open.
+        """
+        self._settings.put(settings)
+
+    def stop(self):
+        self._stopping.set()
+        self._proc.join(1.0)
+        if self._proc.is_alive():
+            logger.error("audio worker didn't stop, killing it")
+            self._proc.kill()
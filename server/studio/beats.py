@@ -0,0 +1,286 @@
+"""
+Streaming onset and beat detection.
+
+    python -m studio.beats song.wav
+
+prints the beats and the tempo detected in a WAV file, which is how the
+detector is checked offline against recordings.
+
+Onsets are found with spectral flux: how much the (log compressed) magnitude
+spectrum grew since the previous window. A window is an onset when its flux
+rises above an adaptive threshold, the mean plus `sensitivity` standard
+deviations of the last few seconds of flux, so it follows the loudness and
+density of the music instead of a fixed level. The tempo is estimated from the
+autocorrelation of the flux history.
+"""
+import argparse
+from collections import deque
+import sys
+from typing import BinaryIO
+import wave
+
+import numpy as np
+
+from studio.audio import SAMPLE_SIZE, AudioRingBuffer, BandAnalyzer
+
+# samples between two analyzed windows, live and offline
+HOP_SIZE = SAMPLE_SIZE // 2
+
+
+class BeatDetector:
+    def __init__(
+        self,
+        hop_rate: float,
+        sensitivity: float = 1.5,
+        min_interval: float = 0.25,
+        history: float = 3.0,
+        tempo_history: float = 8.0,
+        min_bpm: float = 60,
+        max_bpm: float = 200,
+    ):
+        """
+        `hop_rate` is the number of windows fed to `process` per second.
+        `min_interval` is the shortest time in seconds between two onsets.
+        """
+        self.hop_rate = hop_rate
+        self.sensitivity = sensitivity
+        self.min_interval = min_interval
+        # flux below this is silence or noise and never an onset
+        self.min_flux = 1e-3
+
+        self._flux = np.zeros(max(int(tempo_history * hop_rate), 8), dtype=np.float32)
+        self._threshold_len = min(max(int(history * hop_rate), 4), len(self._flux))
+        self._processed = 0
+        self._previous: np.ndarray | None = None
+        self._log: np.ndarray | None = None
+
+        # autocorrelation lags covering the tempo range, in windows
+        self._lags = np.arange(
+            max(int(hop_rate * 60 / max_bpm), 1),
+            int(hop_rate * 60 / min_bpm) + 1,
+        )
+        # prefer tempos around 120bpm to avoid locking onto half/double time
+        lag_bpm = 60 * hop_rate / self._lags
+        self._tempo_weights = np.exp(-0.5 * np.log2(lag_bpm / 120) ** 2)
+        self._tempo_every = max(int(hop_rate), 1)
+
+        self.flux = 0.0
+        self.threshold = 0.0
+        self.bpm = 0.0
+        self.beat_count = 0
+        self.last_beat: float | None = None
+        # timestamps of the most recent onsets
+        self.beats: deque[float] = deque(maxlen=64)
+
+    def process(self, amplitudes: np.ndarray, timestamp: float) -> bool:
+        """
+        Feeds the magnitude spectrum of the next window. Returns whether it is
+        an onset.
+        """
+        if self._log is None:
+            self._log = np.empty(len(amplitudes), dtype=np.float32)
+            self._previous = np.zeros(len(amplitudes), dtype=np.float32)
+
+        np.log1p(amplitudes, out=self._log)
+        np.subtract(self._log, self._previous, out=self._previous)
+        # half wave rectified: only energy that appeared counts
+        flux = float(np.maximum(self._previous, 0).sum()) / len(self._log)
+        self._log, self._previous = self._previous, self._log
+
+        previous_flux = self.flux
+        self.flux = flux
+        self._flux[self._processed % len(self._flux)] = flux
+        self._processed += 1
+
+        recent = self._recent(self._threshold_len)
+        self.threshold = max(
+            float(recent.mean() + self.sensitivity * recent.std()), self.min_flux
+        )
+
+        if self._processed % self._tempo_every == 0:
+            self._estimate_tempo()
+
+        is_onset = (
+            # the first window has nothing to be compared with
+            self._processed > 1
+            and flux > self.threshold
+            and flux > previous_flux
+            and (
+                self.last_beat is None
+                or timestamp - self.last_beat >= self.min_interval
+            )
+        )
+        if is_onset:
+            self.beat_count += 1
+            self.last_beat = timestamp
+            self.beats.append(timestamp)
+
+        return is_onset
+
+    def _recent(self, count: int) -> np.ndarray:
+        """
+        The last `count` flux values, oldest first.
+        """
+        count = min(count, self._processed)
+        end = self._processed % len(self._flux)
+        if count <= end:
+            return self._flux[end - count:end]
+
+        return np.concatenate((self._flux[end - count:], self._flux[:end]))
+
+    def _estimate_tempo(self):
+        flux = self._recent(len(self._flux))
+        if len(flux) <= self._lags[-1] * 2:
+            return
+
+        flux = flux - flux.mean()
+        energy = float(np.dot(flux, flux))
+        if energy <= 0:
+            return
+
+        correlation = np.array(
+            [np.dot(flux[:-lag], flux[lag:]) for lag in self._lags]
+        ) / energy
+        scores = correlation * self._tempo_weights
+        best = int(np.argmax(scores))
+        if scores[best] <= 0:
+            return
+
+        # parabolic interpolation between neighbouring lags
+        lag = float(self._lags[best])
+        if 0 < best < len(scores) - 1:
+            before, peak, after = scores[best - 1:best + 2]
+            denominator = before - 2 * peak + after
+            if denominator != 0:
+                lag += 0.5 * (before - after) / denominator
+
+        self.bpm = 60 * self.hop_rate / lag
+
+
+class BeatTracker:
+    """
+    Feeds live audio to a `BeatDetector`.
+
+    The render loop runs at the frame rate, but the detector needs a steady
+    hop rate to compare windows and estimate the tempo. `update` analyzes
+    every hop the audio callback delivered since the previous call, so the
+    detector sees the same windows whatever the frame rate is.
+    """
+
+    # bounds the work per frame after a stall, older audio is skipped
+    max_hops = 8
+
+    def __init__(
+        self,
+        audio: AudioRingBuffer,
+        analyzer: BandAnalyzer,
+        detector: BeatDetector,
+        hop_size: int = HOP_SIZE,
+    ):
+        self.audio = audio
+        self.analyzer = analyzer
+        self.detector = detector
+        self.hop_size = hop_size
+        # sample number the next window ends at
+        self._next = analyzer.sample_size
+
+    def update(self) -> bool:
+        """
+        Analyzes the new audio. Returns whether there was an onset in it, the
+        band volumes of the newest window are left in `analyzer.volumes`.
+        """
+        written = self.audio.written
+        self._next = max(self._next, written - self.max_hops * self.hop_size)
+
+        onset = False
+        while self._next <= written:
+            samples = self.audio.read_window(self._next, out=self.analyzer.samples)
+            self.analyzer.analyze(samples)
+            timestamp = self._next / self.analyzer.sample_rate
+            onset |= self.detector.process(self.analyzer.amplitudes, timestamp)
+            self._next += self.hop_size
+
+        return onset
+
+
+def load_wav(path: str | BinaryIO) -> tuple[np.ndarray, int]:
+    """
+    Reads a PCM WAV file (a path or a file object) as mono float32 samples
+    between -1 and 1. Returns the samples and the sample rate.
+    """
+    with wave.open(path, "rb") as f:
+        sample_rate = f.getframerate()
+        channels = f.getnchannels()
+        width = f.getsampwidth()
+        raw = f.readframes(f.getnframes())
+
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 2**15
+    elif width == 3:
+        data = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        samples = (
+            data[:, 0].astype(np.int32)
+            | (data[:, 1].astype(np.int32) << 8)
+            | (data[:, 2].astype(np.int8).astype(np.int32) << 16)
+        ).astype(np.float32) / 2**23
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2**31
+    else:
+        raise ValueError(f"unsupported sample width: {width} bytes")
+
+    return samples.reshape(-1, channels).mean(axis=1), sample_rate
+
+
+def spectrogram(
+    samples: np.ndarray, sample_size: int = SAMPLE_SIZE, hop_size: int = HOP_SIZE
+) -> np.ndarray:
+    """
+    Magnitude spectra of every `hop_size` step, computed in one batch.
+    Returns an array shaped (n_windows, sample_size // 2 + 1).
+    """
+    if len(samples) < sample_size:
+        samples = np.pad(samples, (0, sample_size - len(samples)))
+
+    windows = np.lib.stride_tricks.sliding_window_view(samples, sample_size)[::hop_size]
+    return np.abs(np.fft.rfft(windows * np.hanning(sample_size), axis=1))
+
+
+def detect_beats(
+    samples: np.ndarray,
+    sample_rate: int,
+    sample_size: int = SAMPLE_SIZE,
+    hop_size: int = HOP_SIZE,
+    **detector_args,
+) -> tuple[np.ndarray, float]:
+    """
+    Runs the streaming detector over a whole recording. Returns the onset
+    times in seconds and the final tempo estimate.
+    """
+    detector = BeatDetector(sample_rate / hop_size, **detector_args)
+    onsets = []
+    for window_num, amplitudes in enumerate(spectrogram(samples, sample_size, hop_size)):
+        # same timestamps as live: the end of the window
+        timestamp = (window_num * hop_size + sample_size) / sample_rate
+        if detector.process(amplitudes, timestamp):
+            onsets.append(timestamp)
+
+    return np.array(onsets), detector.bpm
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Detect beats in a WAV file")
+    parser.add_argument("path")
+    parser.add_argument("--sensitivity", type=float, default=1.5)
+    args = parser.parse_args(argv)
+
+    samples, sample_rate = load_wav(args.path)
+    beats, bpm = detect_beats(samples, sample_rate, sensitivity=args.sensitivity)
+    for beat in beats:
+        print(f"{beat:.3f}")
+    print(f"{len(beats)} beats, {bpm:.1f} bpm")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
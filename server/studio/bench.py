@@ -0,0 +1,443 @@
+"""
+Benchmarks for the render path.
+
+    python -m studio.bench [--leds 40 300 1000 10000] [--frames 300]
+                           [--fps 60] [--output results.json]
+                           [--compare baseline.json]
+
+Runs every stage of the frame path headlessly against virtual strips:
+
+    show_frame  pushing compiled scene frames through the output stage
+    program     setup + one render/run per frame of every program
+    analysis    audio worker analysis of one frame's worth of synthetic audio
+    sync_music  one music sync frame drawn from the published features
+    preview     set_frame round trip from ScenePlayer to the player process
+    play_scene  compiling a scene and handing it to the player process
+    db          concurrent scene/settings requests against the web app, with
+                pooled WAL connections and with a plain connection per request
+
+and reports per-frame latency percentiles, the highest frame rate the stage
+could sustain (based on p99) and the headroom left in the `--fps` budget.
+Results are written as JSON together with the commit they were measured on,
+and `--compare` prints the change against an earlier run.
+"""
+import argparse
+import importlib
+import json
+import logging
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from threading import Thread
+from time import perf_counter_ns
+
+import numpy as np
+
+import studio.programs
+from studio.audio import AudioRingBuffer
+from studio.audio_worker import AudioAnalysis
+from studio import db
+from studio.frames import compile_frames
+from studio.output import FrameOutput
+from studio.layout import NUM_LEDS, get_layout
+from studio.models import MusicSyncSettings
+from studio.scene_player import (
+    ScenePlayer,
+    _show_frame,
+    sync_music,
+)
+
+DEFAULT_LEDS = (40, 300, 1000, 10000)
+SCENE_SIZES = (10, 100, 500)
+
+
+def summarize(name: str, leds: int, samples_ns: list[int], budget: float, **params):
+    samples = np.array(samples_ns, dtype=np.float64) / 1e6
+    p50, p90, p99 = np.percentile(samples, (50, 90, 99))
+    return {
+        "name": name,
+        "leds": leds,
+        "params": params,
+        "samples": len(samples),
+        "mean_ms": float(samples.mean()),
+        "p50_ms": float(p50),
+        "p90_ms": float(p90),
+        "p99_ms": float(p99),
+        "max_ms": float(samples.max()),
+        "max_fps": float(1000 / p99) if p99 > 0 else float("inf"),
+        "headroom": float(1 - p99 / (budget * 1000)),
+    }
+
+
+def result_key(result: dict) -> str:
+    params = ",".join(f"{key}={value}" for key, value in sorted(result["params"].items()))
+    return f"{result['name']}[{result['leds']}]{params}"
+
+
+def use_layout(num_leds: int, directory: str):
+    """
+    Switches to a single virtual strip of `num_leds` and reloads everything
+    that sized itself from the layout at import time.
+    """
+    path = os.path.join(directory, f"layout-{num_leds}.json")
+    with open(path, "w") as f:
+        json.dump({"strips": [{"backend": "virtual", "length": num_leds}]}, f)
+
+    os.environ["LAYOUT"] = path
+    get_layout.cache_clear()
+    importlib.reload(studio.programs)
+
+
+def random_scene(num_frames: int, num_leds: int) -> list[dict]:
+    colors = np.random.randint(0, 256, size=(num_frames, num_leds, 3))
+    return [
+        {
+            "ledStates": {
+                str(led): {"r": int(r), "g": int(g), "b": int(b)}
+                for led, (r, g, b) in enumerate(frame)
+            }
+        }
+        for frame in colors
+    ]
+
+
+def bench_show_frame(num_leds: int, num_frames: int, budget: float) -> list[dict]:
+    results = []
+    output = FrameOutput(get_layout())
+    for scene_size in SCENE_SIZES:
+        frames = compile_frames(random_scene(scene_size, num_leds), num_leds)
+        samples = []
+        for frame_num in range(num_frames):
+            start = perf_counter_ns()
+            _show_frame(output, frames[frame_num % scene_size])
+            samples.append(perf_counter_ns() - start)
+
+        results.append(
+            summarize("show_frame", num_leds, samples, budget, scene_frames=scene_size)
+        )
+
+    output.close()
+    return results
+
+
+def bench_programs(num_leds: int, num_frames: int, budget: float) -> list[dict]:
+    results = []
+    output = FrameOutput(get_layout())
+    for program_name in sorted(studio.programs.programs_list):
+        module = importlib.reload(
+            importlib.import_module(f"studio.programs.{program_name}")
+        )
+        vectorized = hasattr(module, "render")
+        target = output.buffer if vectorized else output
+        analysis = None
+        if getattr(module, "uses_audio", False):
+            # the audio worker's part isn't timed here, see bench_sync_music
+            source = SyntheticAudio()
+            audio = AudioRingBuffer()
+            analysis = AudioAnalysis(audio, MusicSyncSettings())
+
+        start = perf_counter_ns()
+        if hasattr(module, "setup"):
+            module.setup(target)
+        setup_ns = perf_counter_ns() - start
+
+        samples = []
+        for frame_num in range(num_frames):
+            if analysis:
+                source.feed(audio, 2000)
+                features = analysis.update()
+
+            start = perf_counter_ns()
+            if analysis:
+                module.render(target, frame_num * budget, features)
+                output.show()
+            elif vectorized:
+                module.render(target, frame_num * budget)
+                output.show()
+            else:
+                module.run(target)
+            samples.append(perf_counter_ns() - start)
+
+        result = summarize("program", num_leds, samples, budget, program=program_name)
+        result["setup_ms"] = setup_ns / 1e6
+        results.append(result)
+
+    output.close()
+    return results
+
+
+class SyntheticAudio:
+    """
+    Stands in for the audio device: a few tones plus noise, fed into the ring
+    buffer the same way the input stream callback does.
+    """
+
+    def __init__(self, sample_rate: int = 48000, seconds: float = 2.0):
+        t = np.arange(int(sample_rate * seconds)) / sample_rate
+        # a 2Hz bass pulse over a couple of mid/high tones
+        bass = np.sin(2 * np.pi * 60 * t) * (np.sin(2 * np.pi * 2 * t) > 0)
+        signal = bass + 0.3 * np.sin(2 * np.pi * 880 * t) + 0.1 * np.sin(2 * np.pi * 6000 * t)
+        signal += 0.05 * np.random.randn(len(t))
+        self.samples = (signal / np.abs(signal).max()).astype(np.float32)[:, None]
+        self.position = 0
+
+    def feed(self, audio: AudioRingBuffer, frames: int):
+        if self.position + frames > len(self.samples):
+            self.position = 0
+
+        data = self.samples[self.position:self.position + frames]
+        self.position += frames
+        audio.callback(data, frames, None, None)
+
+
+def bench_sync_music(num_leds: int, num_frames: int, budget: float) -> list[dict]:
+    output = FrameOutput(get_layout())
+    source = SyntheticAudio()
+    audio = AudioRingBuffer()
+    settings = MusicSyncSettings()
+    analysis = AudioAnalysis(audio, settings)
+
+    analysis_samples = []
+    render_samples = []
+    beats_seen = 0
+    for _ in range(num_frames):
+        # a 24fps frame's worth of audio arrives between frames
+        source.feed(audio, 2000)
+        start = perf_counter_ns()
+        features = analysis.update()
+        analysis_samples.append(perf_counter_ns() - start)
+
+        start = perf_counter_ns()
+        onset = features["beat_count"] > beats_seen
+        beats_seen = int(features["beat_count"])
+        sync_music(features, onset, output, settings)
+        output.show()
+        render_samples.append(perf_counter_ns() - start)
+
+    output.close()
+    return [
+        summarize("analysis", num_leds, analysis_samples, budget),
+        summarize("sync_music", num_leds, render_samples, budget),
+    ]
+
+
+def bench_player(num_frames: int, budget: float) -> list[dict]:
+    """
+    Round trips through a real player process, at the LED count the player
+    was imported with.
+    """
+    num_leds = NUM_LEDS
+    player = ScenePlayer()
+    results = []
+    try:
+        frames = random_scene(num_frames, num_leds)
+        framebuffer = player._framebuffer
+
+        samples = []
+        for frame in frames:
+            start = perf_counter_ns()
+            player.set_frame(frame)
+            seq = framebuffer.seq
+            while framebuffer.consumed < seq:
+                pass
+            samples.append(perf_counter_ns() - start)
+
+        results.append(summarize("preview", num_leds, samples, budget))
+
+        # every play is a new version of the scene, so it misses the scene
+        # cache and the player counts it once it has taken the frames
+        version = 0
+        for scene_size in SCENE_SIZES:
+            scene = {"id": 0, "fps": 5, "brightness": 20}
+            scene_frames = compile_frames(random_scene(scene_size, num_leds), num_leds)
+            samples = []
+            for _ in range(10):
+                version += 1
+                misses = player._stats.get("scene_cache_misses")
+                start = perf_counter_ns()
+                player.play_scene(scene, scene_frames, version)
+                while player._stats.get("scene_cache_misses") <= misses:
+                    pass
+                samples.append(perf_counter_ns() - start)
+
+            results.append(
+                summarize("play_scene", num_leds, samples, budget, scene_frames=scene_size)
+            )
+    finally:
+        player.close()
+
+    return results
+
+
+class UnpooledConnections:
+    """
+    How the app used to talk to the database: a fresh connection with the
+    default settings for every request.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def acquire(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+    def release(self, con: sqlite3.Connection):
+        con.close()
+
+    def close(self):
+        pass
+
+
+def bench_db(
+    directory: str, num_requests: int, budget: float, threads: int = 4, num_scenes: int = 20
+) -> list[dict]:
+    """
+    Every thread loops over reading a scene, saving it and reading the music
+    sync settings through the Flask app, like a few UI clients at once.
+    """
+    from studio.app import app
+
+    num_leds = 300
+    scene = {
+        "name": "bench",
+        "ledPositions": {},
+        "frames": random_scene(10, num_leds),
+        "fps": 5,
+        "brightness": 20,
+    }
+    original_pool = db.pool
+    results = []
+    for name, make_pool in (
+        ("unpooled", UnpooledConnections),
+        ("pooled", db.ConnectionPool),
+    ):
+        path = os.path.join(directory, f"bench-{name}.db")
+        db.pool = make_pool(path)
+        con = db.pool.acquire()
+        db.init_db(con)
+        for scene_id in range(num_scenes):
+            db.insert_scene(con.cursor(), scene_id, scene)
+        con.commit()
+        db.pool.release(con)
+
+        samples = [[] for _ in range(threads)]
+        errors = [0] * threads
+
+        def client(thread_num: int):
+            client = app.test_client()
+            for request_num in range(num_requests // threads):
+                scene_id = (thread_num + request_num) % num_scenes
+                start = perf_counter_ns()
+                if request_num % 3 == 0:
+                    response = client.get(f"/api/scenes/{scene_id}")
+                elif request_num % 3 == 1:
+                    response = client.put(f"/api/scenes/{scene_id}", json=scene)
+                else:
+                    response = client.get("/api/sync-music/settings")
+                samples[thread_num].append(perf_counter_ns() - start)
+                if response.status_code >= 500:
+                    errors[thread_num] += 1
+
+        workers = [Thread(target=client, args=(i,)) for i in range(threads)]
+        start = perf_counter_ns()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = (perf_counter_ns() - start) / 1e9
+
+        all_samples = [sample for thread_samples in samples for sample in thread_samples]
+        result = summarize(
+            "db", num_leds, all_samples, budget, connections=name, threads=threads
+        )
+        result["requests_per_s"] = len(all_samples) / elapsed
+        result["errors"] = sum(errors)
+        results.append(result)
+        db.pool.close()
+
+    db.pool = original_pool
+    return results
+
+
+def current_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, check=True
+        )
+        return output.stdout.decode("utf-8").strip()
+    except Exception:
+        return None
+
+
+def print_results(results: list[dict], baseline: dict[str, dict] | None = None):
+    header = f"{'benchmark':<48}{'p50 ms':>9}{'p99 ms':>9}{'max fps':>10}{'headroom':>10}"
+    if baseline is not None:
+        header += f"{'p99 vs base':>13}"
+    print(header)
+
+    for result in results:
+        key = result_key(result)
+        line = (
+            f"{key:<48}{result['p50_ms']:>9.3f}{result['p99_ms']:>9.3f}"
+            f"{result['max_fps']:>10.0f}{result['headroom']:>10.0%}"
+        )
+        if baseline is not None and key in baseline:
+            before = baseline[key]["p99_ms"]
+            line += f"{(result['p99_ms'] - before) / before:>+13.1%}"
+        if "requests_per_s" in result:
+            line += f"  {result['requests_per_s']:.0f} req/s, {result['errors']} errors"
+        print(line)
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--leds", type=int, nargs="+", default=DEFAULT_LEDS)
+    parser.add_argument("--frames", type=int, default=300, help="frames per benchmark")
+    parser.add_argument("--fps", type=float, default=60, help="target frame rate")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    budget = 1 / args.fps
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for num_leds in args.leds:
+            use_layout(num_leds, directory)
+            results += bench_show_frame(num_leds, args.frames, budget)
+            results += bench_programs(num_leds, args.frames, budget)
+            results += bench_sync_music(num_leds, args.frames, budget)
+
+        # the player sizes itself at import, so keep its LED count
+        use_layout(NUM_LEDS, directory)
+        results += bench_player(args.frames, budget)
+        results += bench_db(directory, args.frames * 4, budget)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {result_key(result): result for result in json.load(f)["results"]}
+
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {
+                    "commit": current_commit(),
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "fps": args.fps,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
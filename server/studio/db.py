@@ -0,0 +1,742 @@
+"""
+Data access for the web app.
+
+Requests borrow a connection from a pool instead of opening the database every
+time: `get_db()` hands out one connection per request and it goes back to the
+pool when the request ends. Every connection runs in WAL mode, so readers
+never wait for the writer, with synchronous=NORMAL, which only syncs at
+checkpoints and is still safe in WAL mode. A writer waits up to
+`BUSY_TIMEOUT` ms for the lock instead of failing with "database is locked".
+Connections cache their prepared statements, so the same queries are not
+parsed again on every request.
+
+Scene frames are not stored as JSON but as the bytes of their compiled
+(n_frames, n_leds, 3) array, see `studio.frames.pack_frames`, next to the rest
+of the scene in `data`. Set STUDIO_FRAMES_ENCODING=zlib to compress new and
+updated scenes, "raw" (the default) keeps them patchable in place.
+
+The database is `studio.db` unless the STUDIO_DB environment variable names
+another file.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from json import dumps, loads
+import logging
+import os
+from queue import Empty, Full, LifoQueue
+import sqlite3
+
+from flask import Flask, g
+
+import numpy as np
+
+from studio.audio import SAMPLE_RATE, SAMPLE_SIZE
+from studio.frames import (
+    compile_frame,
+    compile_frames,
+    compile_led_states,
+    fit_frames,
+    decompile_frames,
+    frames_width,
+    pack_frames,
+    unpack_frames,
+)
+from studio.layout import NUM_LEDS
+from studio.models import Frame, MusicSyncSettings
+
+DB_PATH = os.environ.get("STUDIO_DB", "studio.db")
+FRAMES_ENCODING = os.environ.get("STUDIO_FRAMES_ENCODING", "raw")
+# idle connections kept around, more are opened when needed
+POOL_SIZE = 8
+BUSY_TIMEOUT = 5000
+
+SceneQueryResult = namedtuple("Scene", ["id", "data", "version"])
+logger = logging.getLogger(__name__)
+
+
+def connect(path: str = DB_PATH) -> sqlite3.Connection:
+    # connections move between request threads, but only one uses it at a time
+    con = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
+    con.execute("PRAGMA journal_mode = WAL")
+    con.execute("PRAGMA synchronous = NORMAL")
+    con.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+    return con
+
+
+class ConnectionPool:
+    def __init__(self, path: str = DB_PATH, size: int = POOL_SIZE):
+        self.path = path
+        # last in, first out: the busiest connections stay warm
+        self._idle: LifoQueue[sqlite3.Connection] = LifoQueue(maxsize=size)
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            return connect(self.path)
+
+    def release(self, con: sqlite3.Connection):
+        # don't hand a half finished transaction to the next request
+        if con.in_transaction:
+            con.rollback()
+
+        try:
+            self._idle.put_nowait(con)
+        except Full:
+            con.close()
+
+    @contextmanager
+    def connection(self):
+        con = self.acquire()
+        try:
+            yield con
+        finally:
+            self.release(con)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                break
+
+
+pool = ConnectionPool()
+
+
+def get_db() -> sqlite3.Connection:
+    """
+    The current request's connection.
+    """
+    if "db" not in g:
+        g.db = pool.acquire()
+
+    return g.db
+
+
+def close_db(exception: BaseException | None = None):
+    con = g.pop("db", None)
+    if con is not None:
+        pool.release(con)
+
+
+def init_app(app: Flask):
+    app.teardown_appcontext(close_db)
+
+
+def init_db(con: sqlite3.Connection):
+    logger.debug("creating database")
+    cur = con.cursor()
+    cur.execute(
+        "CREATE TABLE IF NOT EXISTS scenes (id INTEGER PRIMARY KEY, data JSON NOT NULL)"
+    )
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS music_sync_settings
+            (
+                id INTEGER PRIMARY KEY,
+                activation_threshold FLOAT NOT NULL,
+                transition_scale FLOAT NOT NULL,
+                low_range_color_scale FLOAT NOT NULL,
+                mid_range_color_scale FLOAT NOT NULL,
+                high_range_color_scale FLOAT NOT NULL,
+                low_range INTEGER NOT NULL,
+                mid_range INTEGER NOT NULL
+            )
+        """
+    )
+    # precomputed feature tracks of music scenes, see studio.tracks
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS scene_tracks
+            (
+                scene_id INTEGER PRIMARY KEY,
+                track BLOB NOT NULL
+            )
+        """
+    )
+    con.commit()
+
+    try:
+        cur = con.cursor()
+        cur.execute("ALTER TABLE scenes ADD COLUMN locked INTEGER DEFAULT 0")
+        con.commit()
+    except Exception:
+        pass
+
+    # data migrations, tracked in sqlite's user_version
+    cur = con.cursor()
+    schema_version = cur.execute("PRAGMA user_version").fetchone()[0]
+    if schema_version < 1:
+        # low_range/mid_range used to be raw FFT bin indexes of a 1024 sample
+        # window at 48kHz, they are band edges in Hz now, below the nyquist
+        # frequency like the settings endpoint asks for
+        nyquist = SAMPLE_RATE // 2
+        cur.execute(
+            f"""
+            UPDATE music_sync_settings SET
+                low_range = MIN(CAST(low_range * {SAMPLE_RATE / SAMPLE_SIZE} AS INTEGER), {nyquist - 2}),
+                mid_range = MIN(CAST(mid_range * {SAMPLE_RATE / SAMPLE_SIZE} AS INTEGER), {nyquist - 1})
+            """)
+        cur.execute("PRAGMA user_version = 1")
+        con.commit()
+
+    if schema_version < 2:
+        # summary columns, so listing scenes doesn't have to parse their frames
+        for column in ("name TEXT", "fps INTEGER", "frame_count INTEGER", "preview TEXT"):
+            cur.execute(f"ALTER TABLE scenes ADD COLUMN {column}")
+        rows = cur.execute("SELECT id, data FROM scenes").fetchall()
+        cur.executemany(
+            "UPDATE scenes SET name = ?, fps = ?, frame_count = ?, preview = ? WHERE id = ?",
+            [
+                scene_summary(scene, compile_scene_frames(scene)) + (scene_id,)
+                for scene_id, scene in ((scene_id, loads(data)) for scene_id, data in rows)
+            ],
+        )
+        cur.execute("PRAGMA user_version = 2")
+        con.commit()
+
+    if schema_version < 3:
+        # frames move out of the JSON into a packed RGB blob. one scene at a
+        # time, big libraries don't have to fit in memory
+        for column in ("frames BLOB", "n_leds INTEGER", "frames_encoding TEXT"):
+            cur.execute(f"ALTER TABLE scenes ADD COLUMN {column}")
+        scene_ids = [row[0] for row in cur.execute("SELECT id FROM scenes").fetchall()]
+        for scene_id in scene_ids:
+            data = loads(
+                cur.execute("SELECT data FROM scenes WHERE id = ?", (scene_id,)).fetchone()[0]
+            )
+            cur.execute(
+                """
+                UPDATE scenes SET data = ?, frames = ?, n_leds = ?, frames_encoding = ?
+                WHERE id = ?
+                """,
+                scene_columns(data)[:4] + (scene_id,),
+            )
+        cur.execute("PRAGMA user_version = 3")
+        con.commit()
+        # give back the space of the old JSON
+        if scene_ids:
+            con.execute("VACUUM")
+
+    if schema_version < 4:
+        # bumped on every change of a scene
+        cur.execute("ALTER TABLE scenes ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        cur.execute("PRAGMA user_version = 4")
+        con.commit()
+
+    if schema_version < 5:
+        # library_version goes up with every change to any scene, the triggers
+        # catch them all, including new routes nobody remembered to bump it in
+        cur.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value)")
+        cur.execute("INSERT INTO meta (key, value) VALUES ('library_version', 1)")
+        for event in ("INSERT", "UPDATE", "DELETE"):
+            cur.execute(
+                f"""
+                CREATE TRIGGER scenes_{event.lower()}_library_version AFTER {event} ON scenes
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'library_version';
+                END
+                """
+            )
+        cur.execute("PRAGMA user_version = 5")
+        con.commit()
+
+    try:
+        cur = con.cursor()
+        cur.execute(
+            """
+                INSERT INTO music_sync_settings (
+                    id,
+                    activation_threshold,
+                    transition_scale,
+                    low_range_color_scale,
+                    mid_range_color_scale,
+                    high_range_color_scale,
+                    low_range,
+                    mid_range
+                ) VALUES (0, 0.2, 0.2, 1.0, 1.0, 1.0, 250, 4000)
+            """)
+        con.commit()
+    except Exception:
+        pass
+
+    logger.debug("database created")
+
+
+# SCENES
+# colors in a scene's preview
+PREVIEW_COLORS = 16
+
+
+# columns that make up a stored scene, in the order of `scene_columns`
+SCENE_COLUMNS = (
+    "data", "frames", "n_leds", "frames_encoding", "name", "fps", "frame_count", "preview"
+)
+
+
+def compile_scene_frames(data: dict) -> np.ndarray:
+    """
+    The frames of a scene as an array at least as wide as the strip. A scene
+    without frames gets a single black one, stored scenes always have one.
+    """
+    frames = data.get("frames") or [{"ledStates": {}}]
+    return compile_frames(frames, max(NUM_LEDS, frames_width(frames)))
+
+
+def preview_colors(first_frame: np.ndarray | None) -> str:
+    """
+    The first distinct colors of a scene's first frame as a JSON list of hex
+    strings.
+    """
+    preview = []
+    if first_frame is not None:
+        for r, g, b in first_frame[first_frame.any(axis=1)].tolist():
+            color = f"#{r:02x}{g:02x}{b:02x}"
+            if color not in preview:
+                preview.append(color)
+                if len(preview) == PREVIEW_COLORS:
+                    break
+
+    return dumps(preview)
+
+
+def scene_summary(data: dict, frames: np.ndarray) -> tuple[str, int, int, str]:
+    """
+    The summary columns of a scene: name, fps, frame count and preview.
+    """
+    return (
+        data.get("name", ""),
+        data.get("fps", 5),
+        len(frames),
+        preview_colors(frames[0] if len(frames) else None),
+    )
+
+
+def scene_columns(data: dict, encoding: str = FRAMES_ENCODING) -> tuple:
+    """
+    The values of `SCENE_COLUMNS` for a scene document: everything but the
+    frames stays JSON, the frames are packed.
+    """
+    frames = compile_scene_frames(data)
+    metadata = {key: value for key, value in data.items() if key not in ("id", "frames")}
+    return (
+        dumps(metadata),
+        pack_frames(frames, encoding),
+        frames.shape[1],
+        encoding,
+    ) + scene_summary(data, frames)
+
+
+def _scene_from_row(row: tuple) -> SceneQueryResult:
+    # row is id, data, frames, frame_count, n_leds, frames_encoding, version
+    id_, data, frames, frame_count, n_leds, encoding, version = row
+    data = loads(data)
+    data["frames"] = decompile_frames(unpack_frames(frames, frame_count, n_leds, encoding))
+    data["id"] = id_
+    return SceneQueryResult(id_, data, version)
+
+
+def get_library_version(cur: sqlite3.Cursor) -> int:
+    """
+    A counter that changes whenever any scene changes.
+    """
+    return cur.execute("SELECT value FROM meta WHERE key = 'library_version'").fetchone()[0]
+
+
+def get_last_scene_id(cur: sqlite3.Cursor) -> int:
+    res = cur.execute("SELECT id FROM scenes ORDER BY id DESC LIMIT 1").fetchone()
+    if res:
+        return res[0]
+
+    return -1
+
+
+def get_scene_by_id(cur: sqlite3.Cursor, scene_id: int) -> SceneQueryResult | None:
+    res = cur.execute(
+        """
+        SELECT id, data, frames, frame_count, n_leds, frames_encoding, version
+        FROM scenes WHERE id = ?
+        """,
+        (scene_id,),
+    ).fetchone()
+    if res:
+        return _scene_from_row(res)
+
+    return None
+
+
+def get_scene_metadata(cur: sqlite3.Cursor, scene_id: int) -> SceneQueryResult | None:
+    """
+    A scene without its frames, see `get_scene_frames`.
+    """
+    res = cur.execute("SELECT data, version FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    if res:
+        data = loads(res[0])
+        data["id"] = scene_id
+        return SceneQueryResult(scene_id, data, res[1])
+
+    return None
+
+
+def get_scene_frames(cur: sqlite3.Cursor, scene_id: int) -> np.ndarray | None:
+    """
+    The frames of a scene as a (n_frames, n_leds, 3) array, straight from the
+    stored bytes.
+    """
+    loaded = _load_frames(cur, scene_id)
+    return loaded[0] if loaded else None
+
+
+def scene_exists(cur: sqlite3.Cursor, scene_id: int) -> bool:
+    return cur.execute("SELECT 1 FROM scenes WHERE id = ?", (scene_id,)).fetchone() is not None
+
+
+def get_scenes(cur: sqlite3.Cursor) -> list[SceneQueryResult]:
+    return [
+        _scene_from_row(row)
+        for row in cur.execute(
+            """
+            SELECT id, data, frames, frame_count, n_leds, frames_encoding, version
+            FROM scenes
+            """
+        ).fetchall()
+    ]
+
+
+def get_scene_summaries(
+    cur: sqlite3.Cursor, limit: int, offset: int = 0
+) -> list[dict]:
+    rows = cur.execute(
+        """
+        SELECT id, name, fps, frame_count, locked, preview FROM scenes
+        ORDER BY id LIMIT ? OFFSET ?
+        """,
+        (limit, offset),
+    ).fetchall()
+    return [
+        {
+            "id": id_,
+            "name": name,
+            "fps": fps,
+            "frameCount": frame_count,
+            "locked": bool(locked),
+            "preview": loads(preview),
+        }
+        for id_, name, fps, frame_count, locked, preview in rows
+    ]
+
+
+def count_scenes(cur: sqlite3.Cursor) -> int:
+    return cur.execute("SELECT COUNT(*) FROM scenes").fetchone()[0]
+
+
+# the version of a new scene. every version bump also bumps the library
+# version, so it is bigger than any version handed out before: an id that is
+# reused after a delete never repeats an old (id, version) pair
+NEW_VERSION = "(SELECT value + 1 FROM meta WHERE key = 'library_version')"
+
+
+def insert_scene(cur: sqlite3.Cursor, scene_id: int, data: dict):
+    cur.execute(
+        f"""
+        INSERT INTO scenes (id, {", ".join(SCENE_COLUMNS)}, version)
+        VALUES (?, {", ".join("?" * len(SCENE_COLUMNS))}, {NEW_VERSION})
+        """,
+        (scene_id,) + scene_columns(data),
+    )
+
+
+def update_scene(cur: sqlite3.Cursor, scene_id: int, data: dict):
+    cur.execute(
+        f"""
+        UPDATE scenes SET
+            {", ".join(f"{column} = ?" for column in SCENE_COLUMNS)},
+            version = version + 1
+        WHERE id = ?
+        """,
+        scene_columns(data) + (scene_id,),
+    )
+
+
+def copy_scene(cur: sqlite3.Cursor, scene_id: int, new_id: int) -> bool:
+    """
+    Copies a scene without unpacking its frames. False if there is no scene
+    `scene_id`.
+    """
+    cur.execute(
+        f"""
+        INSERT INTO scenes (id, {", ".join(SCENE_COLUMNS)}, version)
+        SELECT ?, {", ".join(SCENE_COLUMNS)}, {NEW_VERSION} FROM scenes WHERE id = ?
+        """,
+        (new_id, scene_id),
+    )
+    return cur.rowcount > 0
+
+
+# PATCHING SCENES
+# the patch functions return the scene's new version, or None if there is no
+# such scene. frame numbers out of range raise IndexError
+def get_scene_version(cur: sqlite3.Cursor, scene_id: int) -> int | None:
+    res = cur.execute("SELECT version FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    return res[0] if res else None
+
+
+def _check_width(width: int, n_leds: int):
+    # patches may grow a scene up to the layout, not to whatever LED index a
+    # request names
+    limit = max(n_leds, NUM_LEDS)
+    if width > limit:
+        raise ValueError(f"LED {width - 1} out of range, scenes have at most {limit} LEDs")
+
+
+def _bump_version(cur: sqlite3.Cursor, scene_id: int) -> int:
+    cur.execute("UPDATE scenes SET version = version + 1 WHERE id = ?", (scene_id,))
+    return get_scene_version(cur, scene_id)
+
+
+def _load_frames(cur: sqlite3.Cursor, scene_id: int) -> tuple[np.ndarray, str] | None:
+    res = cur.execute(
+        "SELECT frames, frame_count, n_leds, frames_encoding FROM scenes WHERE id = ?",
+        (scene_id,),
+    ).fetchone()
+    if res:
+        frames, frame_count, n_leds, encoding = res
+        return unpack_frames(frames, frame_count, n_leds, encoding), encoding
+
+    return None
+
+
+def _store_frames(cur: sqlite3.Cursor, scene_id: int, frames: np.ndarray, encoding: str):
+    cur.execute(
+        """
+        UPDATE scenes SET frames = ?, n_leds = ?, frame_count = ?, preview = ?
+        WHERE id = ?
+        """,
+        (
+            pack_frames(frames, encoding),
+            frames.shape[1],
+            len(frames),
+            preview_colors(frames[0] if len(frames) else None),
+            scene_id,
+        ),
+    )
+
+
+# Connection.blobopen is new in Python 3.11, older ones read and write the
+# frame with substr(), which costs a copy of the blob inside sqlite but still
+# only moves one frame in and out of Python
+HAS_BLOBOPEN = hasattr(sqlite3.Connection, "blobopen")
+
+
+def _read_frame(cur: sqlite3.Cursor, scene_id: int, frame_num: int, n_leds: int) -> np.ndarray:
+    # one frame of raw frames
+    frame_size = n_leds * 3
+    if HAS_BLOBOPEN:
+        with cur.connection.blobopen("scenes", "frames", scene_id, readonly=True) as blob:
+            blob.seek(frame_num * frame_size)
+            data = blob.read(frame_size)
+    else:
+        data = cur.execute(
+            "SELECT substr(frames, ?, ?) FROM scenes WHERE id = ?",
+            (frame_num * frame_size + 1, frame_size, scene_id),
+        ).fetchone()[0]
+
+    return np.frombuffer(data, dtype=np.uint8).reshape(n_leds, 3).copy()
+
+
+def _write_frame(cur: sqlite3.Cursor, scene_id: int, frame_num: int, frame: np.ndarray):
+    # overwrites one frame of raw frames, the blob keeps its size
+    frame_size = frame.nbytes
+    if HAS_BLOBOPEN:
+        with cur.connection.blobopen("scenes", "frames", scene_id) as blob:
+            blob.seek(frame_num * frame_size)
+            blob.write(frame.tobytes())
+    else:
+        # || makes text of the blobs, in a UTF-8 database the cast gets back
+        # exactly the same bytes
+        cur.execute(
+            """
+            UPDATE scenes SET
+                frames = CAST(substr(frames, 1, ?) || ? || substr(frames, ?) AS BLOB)
+            WHERE id = ?
+            """,
+            (
+                frame_num * frame_size,
+                frame.tobytes(),
+                (frame_num + 1) * frame_size + 1,
+                scene_id,
+            ),
+        )
+
+
+def update_frame_leds(
+    cur: sqlite3.Cursor, scene_id: int, frame_num: int, led_states: dict
+) -> int | None:
+    """
+    Changes the LEDs in `led_states` in one frame and leaves the others
+    alone. Raw frames are rewritten in place, only the bytes of that frame are
+    read and written.
+    """
+    res = cur.execute(
+        "SELECT frame_count, n_leds, frames_encoding FROM scenes WHERE id = ?",
+        (scene_id,),
+    ).fetchone()
+    if not res:
+        return None
+
+    frame_count, n_leds, encoding = res
+    if not 0 <= frame_num < frame_count:
+        raise IndexError(f"frame {frame_num} out of range")
+
+    leds, colors = compile_led_states(led_states)
+    _check_width(int(leds.max(initial=-1)) + 1, n_leds)
+    # an UPDATE first, so the blob is written inside the request's transaction
+    version = _bump_version(cur, scene_id)
+    if encoding == "raw" and (not len(leds) or leds.max() < n_leds):
+        frame = _read_frame(cur, scene_id, frame_num, n_leds)
+        frame[leds] = colors
+        _write_frame(cur, scene_id, frame_num, frame)
+
+        if frame_num == 0:
+            cur.execute(
+                "UPDATE scenes SET preview = ? WHERE id = ?", (preview_colors(frame), scene_id)
+            )
+    else:
+        # compressed, or an LED past the end of the stored frames
+        frames, encoding = _load_frames(cur, scene_id)
+        frames = fit_frames(frames, max(frames.shape[1], int(leds.max(initial=-1)) + 1))
+        frames[frame_num, leds] = colors
+        _store_frames(cur, scene_id, frames, encoding)
+
+    return version
+
+
+def insert_frame(
+    cur: sqlite3.Cursor, scene_id: int, frame: Frame, frame_num: int | None = None
+) -> int | None:
+    """
+    Inserts a frame before `frame_num`, or after the last one.
+    """
+    loaded = _load_frames(cur, scene_id)
+    if not loaded:
+        return None
+
+    frames, encoding = loaded
+    if frame_num is None:
+        frame_num = len(frames)
+    if not 0 <= frame_num <= len(frames):
+        raise IndexError(f"frame {frame_num} out of range")
+
+    width = max(frames.shape[1], frames_width([frame]))
+    _check_width(width, frames.shape[1])
+    frames = np.insert(
+        fit_frames(frames, width), frame_num, compile_frame(frame, width), axis=0
+    )
+    _store_frames(cur, scene_id, frames, encoding)
+    return _bump_version(cur, scene_id)
+
+
+def delete_frame(cur: sqlite3.Cursor, scene_id: int, frame_num: int) -> int | None:
+    loaded = _load_frames(cur, scene_id)
+    if not loaded:
+        return None
+
+    frames, encoding = loaded
+    if not 0 <= frame_num < len(frames):
+        raise IndexError(f"frame {frame_num} out of range")
+    if len(frames) == 1:
+        raise ValueError("can't delete the only frame of a scene")
+
+    _store_frames(cur, scene_id, np.delete(frames, frame_num, axis=0), encoding)
+    return _bump_version(cur, scene_id)
+
+
+def move_frame(cur: sqlite3.Cursor, scene_id: int, frame_num: int, to: int) -> int | None:
+    """
+    Moves a frame so it ends up at position `to`.
+    """
+    loaded = _load_frames(cur, scene_id)
+    if not loaded:
+        return None
+
+    frames, encoding = loaded
+    if not 0 <= frame_num < len(frames) or not 0 <= to < len(frames):
+        raise IndexError(f"frame {frame_num} or {to} out of range")
+
+    frames = np.insert(np.delete(frames, frame_num, axis=0), to, frames[frame_num], axis=0)
+    _store_frames(cur, scene_id, frames, encoding)
+    return _bump_version(cur, scene_id)
+
+
+def update_scene_metadata(cur: sqlite3.Cursor, scene_id: int, changes: dict) -> int | None:
+    """
+    Changes the fields in `changes` (anything but the frames) and leaves the
+    rest of the scene alone.
+    """
+    res = cur.execute("SELECT data FROM scenes WHERE id = ?", (scene_id,)).fetchone()
+    if not res:
+        return None
+
+    data = loads(res[0])
+    data.update(changes)
+    cur.execute(
+        "UPDATE scenes SET data = ?, name = ?, fps = ? WHERE id = ?",
+        (dumps(data), data.get("name", ""), data.get("fps", 5), scene_id),
+    )
+    return _bump_version(cur, scene_id)
+
+
+def delete_scene(cur: sqlite3.Cursor, scene_id: int):
+    cur.execute("DELETE FROM scenes WHERE id = ?", (scene_id,))
+    cur.execute("DELETE FROM scene_tracks WHERE scene_id = ?", (scene_id,))
+
+
+def set_scene_locked(cur: sqlite3.Cursor, scene_id: int, locked: bool):
+    cur.execute("UPDATE scenes SET locked = ? WHERE id = ?", (int(locked), scene_id))
+
+
+def set_scene_type(cur: sqlite3.Cursor, scene_id: int, type_: str):
+    cur.execute(
+        """
+        UPDATE scenes SET data = json_set(data, '$.type', ?), version = version + 1
+        WHERE id = ?
+        """,
+        (type_, scene_id),
+    )
+
+
+# MUSIC SYNC SETTINGS
+def get_music_sync_settings(cur: sqlite3.Cursor) -> MusicSyncSettings:
+    res = cur.execute(
+        """
+        select * from music_sync_settings WHERE id = 0;
+        """).fetchone()
+    return MusicSyncSettings(**{
+        description[0]: value
+        for description, value in zip(cur.description, res)
+        if description[0] != "id"
+    })
+
+
+def update_music_sync_settings(cur: sqlite3.Cursor, settings: MusicSyncSettings):
+    cur.execute(
+        """
+        UPDATE music_sync_settings SET
+            activation_threshold = ?,
+            transition_scale = ?,
+            low_range_color_scale = ?,
+            mid_range_color_scale = ?,
+            high_range_color_scale = ?,
+            low_range = ?,
+            mid_range = ?
+        WHERE id = 0;
+        """, (
+            settings.activation_threshold,
+            settings.transition_scale,
+            settings.low_range_color_scale,
+            settings.mid_range_color_scale,
+            settings.high_range_color_scale,
+            settings.low_range,
+            settings.mid_range
+        ))
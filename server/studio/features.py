@@ -0,0 +1,101 @@
+"""
+Audio features in shared memory, published by the audio worker process (see
+studio.audio_worker) and read by the player process.
+
+The features are one fixed-layout record, `FEATURES`. The writer bumps the
+sequence number to an odd value before it touches the record and to the next
+even value once it is done, so a reader that saw the same even sequence number
+before and after copying the record knows the copy is consistent and retries
+otherwise. Neither side ever blocks the other.
+"""
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# log spaced bands in `spectrum`
+N_BANDS = 16
+
+FEATURES = np.dtype([
+    # monotonic() when the newest analyzed samples were captured / analyzed
+    ("captured_at", np.float64),
+    ("analyzed_at", np.float64),
+    ("rms", np.float32),
+    ("peak", np.float32),
+    # band volumes between 0 and 1, see studio.audio.BandAnalyzer
+    ("bass", np.float32),
+    ("mid", np.float32),
+    ("treble", np.float32),
+    # onsets, see studio.beats. last_beat is a monotonic() time
+    ("flux", np.float32),
+    ("bpm", np.float32),
+    ("beat_count", np.uint64),
+    ("last_beat", np.float64),
+    # log compressed energy of every band, lowest frequencies first
+    ("spectrum", np.float32, (N_BANDS,)),
+])
+
+SEQ_SIZE = 8
+
+
+class AudioFeatures:
+    def __init__(self, name: str | None = None):
+        self._owner = name is None
+        self._shm = SharedMemory(
+            name=name, create=self._owner, size=SEQ_SIZE + FEATURES.itemsize
+        )
+        self._seq = np.ndarray((1,), dtype=np.uint64, buffer=self._shm.buf)
+        self._record = np.ndarray(
+            (), dtype=FEATURES, buffer=self._shm.buf, offset=SEQ_SIZE
+        )
+
+        if self._owner:
+            self._seq[0] = 0
+            self._record[...] = np.zeros((), dtype=FEATURES)
+
+    def __getstate__(self):
+        return {"name": self._shm.name}
+
+    def __setstate__(self, state):
+        self.__init__(name=state["name"])
+
+    @property
+    def seq(self) -> int:
+        return int(self._seq[0])
+
+    @staticmethod
+    def empty() -> np.ndarray:
+        """
+        A record to `read` into.
+        """
+        return np.zeros((), dtype=FEATURES)
+
+    def write(self, features: np.ndarray):
+        """
+        Publishes a record. There must only be one writer.
+        """
+        self._seq[0] += 1
+        self._record[...] = features
+        self._seq[0] += 1
+
+    def read(self, out: np.ndarray) -> int:
+        """
+        Copies the newest record into `out`. Returns its sequence number, 0
+        means nothing was published yet.
+        """
+        while True:
+            seq = self.seq
+            if seq % 2:
+                # the writer is in the middle of an update
+                continue
+
+            out[...] = self._record
+            if self.seq == seq:
+                return seq // 2
+
+    def close(self):
+        self._seq = None
+        self._record = None
+        self._shm.close()
+        # only the creating process may unlink the segment
+        if self._owner:
+            self._shm.unlink()
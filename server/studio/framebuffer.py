@@ -0,0 +1,118 @@
+"""
+RGB framebuffer in shared memory, shared by the web process and the player
+process.
+
+The web process writes pixels straight into the buffer and the player picks
+them up without anything being pickled through the input queue. The buffer is
+double buffered: the writer always fills the slot the reader is not looking at
+and then publishes its sequence number, so a reader only has to retry if the
+writer lapped it twice while it was copying.
+
+The reader acknowledges the frames it has shown, which lets the writer tell
+whether the player still has a wakeup pending. Frames published while one is
+pending are coalesced: only the newest one is ever shown.
+"""
+from multiprocessing.shared_memory import SharedMemory
+from threading import Lock
+
+import numpy as np
+
+from studio.frames import compile_frame
+from studio.models import Frame
+
+# header fields, one uint64 each
+PUBLISHED = 0  # sequence number of the newest complete frame
+WRITING = 1  # sequence number of the frame being written
+CONSUMED = 2  # sequence number of the newest frame the reader has shown
+HEADER_FIELDS = 3
+HEADER_SIZE = HEADER_FIELDS * 8
+
+
+class SharedFrameBuffer:
+    def __init__(self, num_leds: int, name: str | None = None):
+        self.num_leds = num_leds
+        self._owner = name is None
+        self._shm = SharedMemory(
+            name=name, create=self._owner, size=HEADER_SIZE + 2 * num_leds * 3
+        )
+        self._header = np.ndarray(
+            (HEADER_FIELDS,), dtype=np.uint64, buffer=self._shm.buf
+        )
+        self._slots = np.ndarray(
+            (2, num_leds, 3), dtype=np.uint8, buffer=self._shm.buf, offset=HEADER_SIZE
+        )
+        self._write_lock = Lock()
+
+        if self._owner:
+            self._header[:] = 0
+            self._slots[:] = 0
+
+    def __getstate__(self):
+        return {"name": self._shm.name, "num_leds": self.num_leds}
+
+    def __setstate__(self, state):
+        self.__init__(state["num_leds"], name=state["name"])
+
+    @property
+    def seq(self) -> int:
+        return int(self._header[PUBLISHED])
+
+    @property
+    def consumed(self) -> int:
+        return int(self._header[CONSUMED])
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of published frames the reader has not caught up with yet.
+        """
+        return self.seq - self.consumed
+
+    def write(self, pixels: np.ndarray) -> int:
+        """
+        Publishes a (num_leds, 3) array. Returns the new sequence number.
+        """
+        with self._write_lock:
+            seq = self.seq + 1
+            self._header[WRITING] = seq
+            self._slots[seq % 2] = pixels
+            self._header[PUBLISHED] = seq
+            return seq
+
+    def write_frame(self, frame: Frame) -> int:
+        """
+        Compiles a frame straight into the back slot and publishes it. Returns
+        the new sequence number.
+        """
+        with self._write_lock:
+            seq = self.seq + 1
+            self._header[WRITING] = seq
+            compile_frame(frame, self.num_leds, out=self._slots[seq % 2])
+            self._header[PUBLISHED] = seq
+            return seq
+
+    def read(self, out: np.ndarray) -> int:
+        """
+        Copies the newest complete frame into `out`. Returns its sequence
+        number.
+        """
+        while True:
+            seq = self.seq
+            out[:] = self._slots[seq % 2]
+            # the slot we copied is only rewritten once the writer gets to seq + 2
+            if int(self._header[WRITING]) <= seq + 1:
+                return seq
+
+    def ack(self, seq: int):
+        """
+        Marks every frame up to `seq` as consumed by the reader.
+        """
+        self._header[CONSUMED] = seq
+
+    def close(self):
+        self._header = None
+        self._slots = None
+        self._shm.close()
+        # only the creating process may unlink the segment
+        if self._owner:
+            self._shm.unlink()
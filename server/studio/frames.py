@@ -0,0 +1,188 @@
+"""
+Helpers for compiling scene frames into packed RGB arrays.
+
+Scenes are edited as `Frame` dicts keyed by stringified LED index. The player
+works on `uint8` arrays shaped (n_frames, n_leds, 3) instead, so a frame can be
+pushed to the strip with a single slice assignment, and the database stores
+the bytes of that array (see `pack_frames`).
+"""
+import zlib
+
+import numpy as np
+
+from studio.models import Frame
+
+
+def compile_frame(
+    frame: Frame, num_leds: int, out: np.ndarray | None = None
+) -> np.ndarray:
+    """
+    Compiles a single frame into a (num_leds, 3) array. LEDs missing from the
+    frame are black and LEDs beyond `num_leds` are ignored.
+    """
+    if out is None:
+        out = np.zeros((num_leds, 3), dtype=np.uint8)
+    else:
+        out[:] = 0
+
+    for led, led_state in frame["ledStates"].items():
+        led_num = int(led)
+        if not led_state or led_num < 0 or led_num >= num_leds:
+            continue
+
+        out[led_num] = (led_state["r"], led_state["g"], led_state["b"])
+
+    return out
+
+
+def compile_frames(frames: list[Frame], num_leds: int) -> np.ndarray:
+    """
+    Compiles every frame of a scene into one contiguous (n_frames, num_leds, 3)
+    array.
+    """
+    compiled = np.zeros((len(frames), num_leds, 3), dtype=np.uint8)
+    for frame_num, frame in enumerate(frames):
+        compile_frame(frame, num_leds, out=compiled[frame_num])
+
+    return compiled
+
+
+def compile_led_states(led_states: dict) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The LED indexes and (r, g, b) colors of a `ledStates` dict, for changing
+    some LEDs of a compiled frame. LEDs set to None are turned off.
+    """
+    leds = np.array([int(led) for led in led_states], dtype=np.int64)
+    colors = np.array(
+        [
+            (state["r"], state["g"], state["b"]) if state else (0, 0, 0)
+            for state in led_states.values()
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    if (leds < 0).any():
+        raise ValueError("LED indexes can't be negative")
+    if (colors < 0).any() or (colors > 255).any():
+        raise ValueError("colors must be between 0 and 255")
+
+    return leds, colors.astype(np.uint8)
+
+
+def frames_width(frames: list[Frame]) -> int:
+    """
+    One past the highest LED index set in any frame.
+    """
+    width = 0
+    for frame in frames:
+        for led, led_state in frame["ledStates"].items():
+            if led_state:
+                width = max(width, int(led) + 1)
+
+    return width
+
+
+def fit_frames(frames: np.ndarray, num_leds: int) -> np.ndarray:
+    """
+    Pads frames with black LEDs or cuts them to `num_leds` LEDs.
+    """
+    if frames.shape[1] == num_leds:
+        return frames
+
+    fitted = np.zeros((len(frames), num_leds, 3), dtype=np.uint8)
+    width = min(frames.shape[1], num_leds)
+    fitted[:, :width] = frames[:, :width]
+    return fitted
+
+
+def decompile_frame(frame: np.ndarray) -> Frame:
+    """
+    The `Frame` dict of a (n_leds, 3) array. Only LEDs that are lit are
+    included.
+    """
+    lit = np.flatnonzero(frame.any(axis=1))
+    return {
+        "ledStates": {
+            str(led): {"r": r, "g": g, "b": b}
+            for led, (r, g, b) in zip(lit.tolist(), frame[lit].tolist())
+        }
+    }
+
+
+def decompile_frames(frames: np.ndarray) -> list[Frame]:
+    return [decompile_frame(frame) for frame in frames]
+
+
+# how packed frames are encoded
+FRAME_ENCODINGS = ("raw", "zlib")
+
+
+def pack_frames(frames: np.ndarray, encoding: str = "raw") -> bytes:
+    """
+    The bytes of a (n_frames, n_leds, 3) array, "raw" or compressed with
+    "zlib". Raw frames can be patched in place, frame n starts at byte
+    n * n_leds * 3.
+    """
+    data = np.ascontiguousarray(frames, dtype=np.uint8).tobytes()
+    if encoding == "zlib":
+        return zlib.compress(data)
+    elif encoding == "raw":
+        return data
+
+    raise ValueError(f"unknown frame encoding {encoding!r}")
+
+
+def unpack_frames(
+    data: bytes, n_frames: int, n_leds: int, encoding: str = "raw"
+) -> np.ndarray:
+    """
+    The (n_frames, n_leds, 3) array packed by `pack_frames`.
+    """
+    if encoding == "zlib":
+        data = zlib.decompress(data)
+    elif encoding != "raw":
+        raise ValueError(f"unknown frame encoding {encoding!r}")
+
+    # frombuffer would be read only
+    return np.frombuffer(data, dtype=np.uint8).reshape(n_frames, n_leds, 3).copy()
+
+
+def check_packed_frames(data: bytes, n_frames: int, n_leds: int, encoding: str = "raw"):
+    """
+    Raises ValueError unless `data` unpacks to exactly n_frames frames of
+    n_leds LEDs.
+    """
+    if n_frames < 1 or n_leds < 1:
+        raise ValueError("frame count and LED count must be positive")
+
+    size = n_frames * n_leds * 3
+    if encoding == "zlib":
+        # never inflates more than one byte past the expected size
+        decompressor = zlib.decompressobj()
+        try:
+            unpacked = len(decompressor.decompress(data, size + 1))
+        except zlib.error as e:
+            raise ValueError(f"corrupt frames: {e}") from e
+        if not decompressor.eof:
+            unpacked = size + 1
+    elif encoding == "raw":
+        unpacked = len(data)
+    else:
+        raise ValueError(f"unknown frame encoding {encoding!r}")
+
+    if unpacked != size:
+        raise ValueError("frames don't match frame_count and n_leds")
+
+
+def unpack_first_frame(data: bytes, n_leds: int, encoding: str = "raw") -> np.ndarray:
+    """
+    Only the first (n_leds, 3) frame of packed frames, without unpacking the
+    rest.
+    """
+    frame_size = n_leds * 3
+    if encoding == "zlib":
+        # a max_length of 0 would decompress everything
+        data = zlib.decompressobj().decompress(data, frame_size) if frame_size else b""
+    elif encoding != "raw":
+        raise ValueError(f"unknown frame encoding {encoding!r}")
+
+    return np.frombuffer(data[:frame_size], dtype=np.uint8).reshape(n_leds, 3)
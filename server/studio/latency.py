@@ -0,0 +1,305 @@
+"""
+Audio to light latency of music sync.
+
+Every frame the player records how old the audio it showed was, split into
+stages:
+
+    analysis  audio captured -> features published by the audio worker
+    render    features published -> frame built by the player
+    show      frame built -> show() returned
+    total     audio captured -> show() returned
+    beat      onset in the audio -> the frame reacting to it was shown
+
+and publishes rolling percentiles of the last few seconds into the player
+stats (see /api/sync-music/latency).
+
+    python -m studio.latency [--fps 24] [--blocksize 512] [--seconds 10]
+
+runs a loopback test instead of the microphone: a fake input stream plays a
+click train with known click times through the real audio worker and a render
+loop like the player's, and reports how long each click took to reach the
+strip. Use it to compare buffer sizes and frame rates.
+"""
+import argparse
+from functools import partial
+import sys
+import threading
+from time import monotonic, sleep
+from types import SimpleNamespace
+
+import numpy as np
+
+from studio.audio import SAMPLE_RATE
+from studio.beats import HOP_SIZE
+from studio.features import AudioFeatures
+from studio.stats import LATENCY_PERCENTILES, LATENCY_STAGES, PlayerStats
+
+
+class LatencyTracker:
+    def __init__(
+        self,
+        stats: PlayerStats | None = None,
+        window: int = 240,
+        publish_every: int = 24,
+    ):
+        """
+        Keeps the last `window` samples of every stage and publishes their
+        percentiles into `stats` every `publish_every` frames.
+        """
+        self.stats = stats
+        self.publish_every = publish_every
+        self._samples = np.full((len(LATENCY_STAGES), window), np.nan)
+        self._recorded = np.zeros(len(LATENCY_STAGES), dtype=np.int64)
+        self._stage_index = {stage: i for i, stage in enumerate(LATENCY_STAGES)}
+        self._frames = 0
+
+    def record(self, stage: str, seconds: float):
+        index = self._stage_index[stage]
+        window = self._samples.shape[1]
+        self._samples[index, self._recorded[index] % window] = seconds
+        self._recorded[index] += 1
+
+    def record_frame(
+        self, features: np.ndarray, built_at: float, shown_at: float, onset: bool
+    ):
+        """
+        Records the stages of a music sync frame drawn from `features`.
+        """
+        captured_at = float(features["captured_at"])
+        if not captured_at:
+            # nothing was captured yet
+            return
+
+        analyzed_at = float(features["analyzed_at"])
+        self.record("analysis", analyzed_at - captured_at)
+        self.record("render", built_at - analyzed_at)
+        self.record("show", shown_at - built_at)
+        self.record("total", shown_at - captured_at)
+        if onset:
+            self.record("beat", shown_at - float(features["last_beat"]))
+
+        self._frames += 1
+        if self.stats and self._frames % self.publish_every == 0:
+            self.publish()
+
+    def percentiles(self) -> dict[str, dict[str, float]]:
+        """
+        Percentiles of every stage in milliseconds. Stages without samples
+        are left out.
+        """
+        result = {}
+        for stage, samples in zip(LATENCY_STAGES, self._samples):
+            samples = samples[~np.isnan(samples)]
+            if len(samples):
+                values = np.percentile(samples, LATENCY_PERCENTILES) * 1000
+                result[stage] = {
+                    f"p{percentile}": float(value)
+                    for percentile, value in zip(LATENCY_PERCENTILES, values)
+                }
+
+        return result
+
+    def publish(self):
+        for stage, values in self.percentiles().items():
+            for name, value in values.items():
+                self.stats.set(f"latency_{stage}_{name}", value)
+        for stage, recorded in zip(LATENCY_STAGES, self._recorded):
+            self.stats.set(f"latency_{stage}_samples", min(recorded, self._samples.shape[1]))
+
+
+def read_latency(stats: dict[str, float]) -> dict[str, dict[str, float]]:
+    """
+    Groups the latency percentiles in a stats dict by stage, like
+    `LatencyTracker.percentiles`. Stages without samples are left out, in
+    track mode for instance there is no audio to measure.
+    """
+    return {
+        stage: {
+            f"p{percentile}": stats[f"latency_{stage}_p{percentile}"]
+            for percentile in LATENCY_PERCENTILES
+        }
+        for stage in LATENCY_STAGES
+        if stats[f"latency_{stage}_samples"]
+    }
+
+
+class ClickTrainStream:
+    """
+    Stands in for `sd.InputStream`: delivers blocks of a click train in real
+    time, starting at the monotonic() time `start_at`. A click starts every
+    `period` seconds, the first one `period` seconds after `start_at`.
+    """
+
+    def __init__(
+        self,
+        start_at: float,
+        period: float,
+        callback=None,
+        blocksize: int = HOP_SIZE,
+        samplerate: int = SAMPLE_RATE,
+        **kwargs,
+    ):
+        self.start_at = start_at
+        self.period = period
+        self.callback = callback
+        self.blocksize = blocksize
+        self.samplerate = samplerate
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        # a decaying 60Hz burst over faint noise
+        length = int(0.08 * samplerate)
+        t = np.arange(length) / samplerate
+        self._click = (
+            np.exp(-t / 0.015) * np.sin(2 * np.pi * 60 * t)
+        ).astype(np.float32)
+
+    def _block(self, first: int) -> np.ndarray:
+        block = np.random.normal(0, 0.005, self.blocksize).astype(np.float32)
+        period = int(self.period * self.samplerate)
+        positions = first + np.arange(self.blocksize)
+        offsets = positions % period
+        clicking = (positions >= period) & (offsets < len(self._click))
+        block[clicking] += self._click[offsets[clicking]]
+        return block[:, None]
+
+    def _run(self):
+        written = 0
+        while not self._stopping.is_set():
+            block = self._block(written)
+            written += self.blocksize
+            # the block is complete once its last sample was "recorded"
+            captured_at = self.start_at + written / self.samplerate
+            delay = captured_at - monotonic()
+            if delay > 0:
+                sleep(delay)
+
+            now = monotonic()
+            time = SimpleNamespace(
+                currentTime=now,
+                inputBufferAdcTime=captured_at - self.blocksize / self.samplerate,
+            )
+            self.callback(block, self.blocksize, time, None)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def close(self):
+        self.stop()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def loopback(
+    fps: int = 24,
+    blocksize: int = HOP_SIZE,
+    seconds: float = 10.0,
+    period: float = 0.5,
+) -> dict:
+    """
+    Runs a click train through the audio worker and a music sync render loop
+    and measures when every click reached the strip.
+    """
+    from studio.audio_worker import AudioWorker
+    from studio.layout import get_layout
+    from studio.models import MusicSyncSettings
+    from studio.output import FrameOutput
+    from studio.scene_player import sync_music
+    from studio.scheduler import FrameScheduler
+
+    settings = MusicSyncSettings()
+    features = AudioFeatures()
+    start_at = monotonic() + 0.5
+    worker = AudioWorker(
+        features,
+        settings,
+        blocksize=blocksize,
+        stream=partial(ClickTrainStream, start_at, period),
+    )
+
+    pixels = FrameOutput(get_layout())
+    tracker = LatencyTracker()
+    scheduler = FrameScheduler("drop")
+    record = AudioFeatures.empty()
+    beats_seen = 0
+    shown_onsets = []
+
+    scheduler.start(fps)
+    try:
+        while monotonic() < start_at + seconds:
+            scheduler.wait()
+            features.read(out=record)
+            beat_count = int(record["beat_count"])
+            onset = beat_count > beats_seen
+            beats_seen = beat_count
+
+            sync_music(record, onset, pixels, settings)
+            built_at = monotonic()
+            pixels.show()
+            shown_at = monotonic()
+            tracker.record_frame(record, built_at, shown_at, onset)
+            if onset:
+                shown_onsets.append(shown_at)
+            scheduler.advance()
+    finally:
+        worker.stop()
+        pixels.close()
+        features.close()
+
+    # match every click with the first onset shown after it
+    clicks = start_at + period * np.arange(1, int(seconds / period))
+    shown_onsets = np.array(shown_onsets)
+    matches = np.searchsorted(shown_onsets, clicks)
+    detected = matches < len(shown_onsets)
+    delays = shown_onsets[matches[detected]] - clicks[detected]
+    # an onset more than a period late belongs to a later click
+    delays = delays[delays < period]
+
+    return {
+        "fps": fps,
+        "blocksize": blocksize,
+        "clicks": len(clicks),
+        "detected": len(delays),
+        "onsets": len(shown_onsets),
+        "click_to_light_ms": {
+            f"p{percentile}": float(value)
+            for percentile, value in zip(
+                LATENCY_PERCENTILES,
+                np.percentile(delays, LATENCY_PERCENTILES) * 1000 if len(delays) else
+                [np.nan] * len(LATENCY_PERCENTILES),
+            )
+        },
+        "stages_ms": tracker.percentiles(),
+    }
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Measure music sync latency with a click train")
+    parser.add_argument("--fps", type=int, default=24)
+    parser.add_argument("--blocksize", type=int, default=HOP_SIZE)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--period", type=float, default=0.5, help="seconds between clicks")
+    args = parser.parse_args(argv)
+
+    result = loopback(args.fps, args.blocksize, args.seconds, args.period)
+    print(
+        f"fps {result['fps']}, blocksize {result['blocksize']}: "
+        f"{result['detected']}/{result['clicks']} clicks detected, "
+        f"{result['onsets']} onsets shown"
+    )
+    for name, values in [("click to light", result["click_to_light_ms"])] + list(
+        result["stages_ms"].items()
+    ):
+        print(f"{name:<16}" + "".join(f"{key:>6} {value:7.1f}ms" for key, value in values.items()))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
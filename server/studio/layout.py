@@ -0,0 +1,89 @@
+"""
+Physical LED layout.
+
+The player renders into one logical framebuffer. The layout maps it onto one or
+more strips, each on its own pin, starting at `offset` in the framebuffer. It is
+read from the JSON file named by the LAYOUT environment variable (default
+`layout.json`), for example
+
+    {
+        "strips": [
+            {"pin": "D18", "length": 300, "offset": 0},
+            {"pin": "D13", "length": 300, "offset": 300},
+            {"backend": "virtual", "length": 300, "offset": 600,
+             "capture": "capture.bin", "capture_frames": 600}
+        ],
+        "groups": [[0, 1, 2], [3, 4, 5]],
+        "shelf_groups": [[0], [1]]
+    }
+
+`groups` are lists of LED indexes that programs light up together and
+`shelf_groups` are lists of indexes into `groups`. Both are optional, see
+`studio.programs` for the defaults. Without a layout file we drive the
+original 40 LED tree on D18.
+
+Virtual strips (see studio.virtual) only exist in memory and can record their
+last `capture_frames` frames into the `capture` file. Strips fall back to the
+virtual backend when the neopixel libraries aren't installed.
+"""
+from dataclasses import dataclass, field
+from functools import cache
+import json
+import logging
+import os
+from typing import Literal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StripConfig:
+    pin: str = "D18"
+    length: int = 40
+    # position of the strip's first LED in the logical framebuffer
+    offset: int = 0
+    backend: Literal["neopixel", "virtual"] = "neopixel"
+    # virtual strips only: file to record pushed frames into
+    capture: str | None = None
+    capture_frames: int = 600
+
+
+@dataclass
+class Layout:
+    strips: list[StripConfig] = field(default_factory=lambda: [StripConfig()])
+    groups: list[list[int]] | None = None
+    shelf_groups: list[list[int]] | None = None
+
+    @property
+    def num_leds(self) -> int:
+        return max(strip.offset + strip.length for strip in self.strips)
+
+
+def load_layout(path: str) -> Layout:
+    with open(path) as f:
+        data = json.load(f)
+
+    strips = [StripConfig(**strip) for strip in data.get("strips", [{}])]
+    if not strips:
+        raise ValueError(f"{path} does not define any strips")
+
+    return Layout(
+        strips=strips,
+        groups=data.get("groups"),
+        shelf_groups=data.get("shelf_groups"),
+    )
+
+
+@cache
+def get_layout() -> Layout:
+    path = os.environ.get("LAYOUT", "layout.json")
+    if not os.path.exists(path):
+        return Layout()
+
+    layout = load_layout(path)
+    logger.info(f"loaded layout from {path}: {layout.num_leds} LEDs")
+    return layout
+
+
+# size of the logical framebuffer
+NUM_LEDS = get_layout().num_leds
@@ -0,0 +1,222 @@
+"""
+Streaming export and import of the whole scene library.
+
+The library is exchanged as NDJSON: a header line, then one line per scene
+with its stored columns as they are. Frames and feature tracks are the base64
+of their blobs, so nothing is decoded on either side:
+
+    {"format": "studio-library", "version": 1}
+    {"id": 3, "data": {...}, "locked": false, "frames": "AAAA...", "n_leds": 300,
+     "frame_count": 20, "frames_encoding": "raw", "track": null}
+
+Both directions handle one scene at a time, memory use doesn't grow with the
+library. An import runs in a single transaction and inserts in batches.
+
+    python -m studio.library export library.ndjson
+    python -m studio.library import library.ndjson [--append]
+
+or GET /api/library/export and POST /api/library/import.
+"""
+import argparse
+from base64 import b64decode, b64encode
+from json import dumps, loads
+import sqlite3
+import sys
+from typing import Iterable, Iterator, Literal
+import zipfile
+import zlib
+
+from studio.db import (
+    DB_PATH,
+    NEW_VERSION,
+    connect,
+    get_last_scene_id,
+    init_db,
+    preview_colors,
+)
+from studio.frames import check_packed_frames, unpack_first_frame
+from studio.tracks import FeatureTrack
+
+FORMAT = "studio-library"
+FORMAT_VERSION = 1
+# scenes per executemany, or fewer once their blobs add up to BATCH_BYTES
+BATCH_SIZE = 100
+BATCH_BYTES = 16 * 2**20
+
+# replace: scenes keep their ids and replace scenes with the same id
+# append: scenes get new ids after the last existing scene
+ImportMode = Literal["replace", "append"]
+
+
+def export_library(cur: sqlite3.Cursor) -> Iterator[str]:
+    """
+    The library as NDJSON lines, read from the database as they are needed.
+    """
+    yield dumps({"format": FORMAT, "version": FORMAT_VERSION}) + "\n"
+
+    rows = cur.execute(
+        """
+        SELECT s.id, s.data, s.locked, s.frames, s.n_leds, s.frame_count,
+            s.frames_encoding, t.track
+        FROM scenes s LEFT JOIN scene_tracks t ON t.scene_id = s.id
+        ORDER BY s.id
+        """
+    )
+    for id_, data, locked, frames, n_leds, frame_count, encoding, track in rows:
+        yield dumps({
+            "id": id_,
+            "data": loads(data),
+            "locked": bool(locked),
+            "frames": b64encode(frames).decode(),
+            "n_leds": n_leds,
+            "frame_count": frame_count,
+            "frames_encoding": encoding,
+            "track": b64encode(track).decode() if track is not None else None,
+        }) + "\n"
+
+
+def _scene_row(scene: dict, scene_id: int) -> tuple:
+    frames = b64decode(scene["frames"], validate=True)
+    n_leds = int(scene["n_leds"])
+    frame_count = int(scene["frame_count"])
+    encoding = scene["frames_encoding"]
+    check_packed_frames(frames, frame_count, n_leds, encoding)
+
+    data = scene["data"]
+    first_frame = unpack_first_frame(frames, n_leds, encoding)
+    return (
+        scene_id,
+        dumps(data),
+        frames,
+        n_leds,
+        encoding,
+        data.get("name", ""),
+        data.get("fps", 5),
+        frame_count,
+        preview_colors(first_frame),
+        int(scene.get("locked", False)),
+    )
+
+
+def _track(encoded: str) -> bytes:
+    # stored as it is, but only once it loads, the player reads it as it plays
+    track = b64decode(encoded, validate=True)
+    FeatureTrack.from_bytes(track)
+    return track
+
+
+def _write_batch(cur: sqlite3.Cursor, scenes: list[tuple], tracks: list[tuple[int, bytes | None]]):
+    # replaced scenes get a new version like any other change, so players and
+    # clients holding the old one notice
+    cur.executemany(
+        f"""
+        INSERT INTO scenes (
+            id, data, frames, n_leds, frames_encoding, name, fps, frame_count, preview,
+            locked, version
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, {NEW_VERSION})
+        ON CONFLICT (id) DO UPDATE SET
+            data = excluded.data,
+            frames = excluded.frames,
+            n_leds = excluded.n_leds,
+            frames_encoding = excluded.frames_encoding,
+            name = excluded.name,
+            fps = excluded.fps,
+            frame_count = excluded.frame_count,
+            preview = excluded.preview,
+            locked = excluded.locked,
+            version = excluded.version
+        """,
+        scenes,
+    )
+    cur.executemany(
+        "INSERT OR REPLACE INTO scene_tracks (scene_id, track) VALUES (?, ?)",
+        [(scene_id, track) for scene_id, track in tracks if track is not None],
+    )
+    # a replaced scene without a track loses the old one
+    cur.executemany(
+        "DELETE FROM scene_tracks WHERE scene_id = ?",
+        [(scene_id,) for scene_id, track in tracks if track is None],
+    )
+
+
+def import_library(
+    cur: sqlite3.Cursor, lines: Iterable[bytes | str], mode: ImportMode = "replace"
+) -> int:
+    """
+    Imports NDJSON lines written by `export_library` and returns the number
+    of scenes. Nothing is committed, the caller commits or rolls back the
+    whole import. Raises ValueError with the line number on bad input.
+    """
+    next_id = get_last_scene_id(cur) + 1
+    scenes: list[tuple] = []
+    tracks: list[tuple[int, bytes | None]] = []
+    batch_bytes = 0
+    imported = 0
+    header_seen = False
+
+    for line_num, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+
+        try:
+            record = loads(line)
+            if not header_seen:
+                if record.get("format") != FORMAT or record.get("version") != FORMAT_VERSION:
+                    raise ValueError(f"not a {FORMAT} version {FORMAT_VERSION} export")
+                header_seen = True
+                continue
+
+            if mode == "append":
+                scene_id = next_id
+                next_id += 1
+            else:
+                scene_id = int(record["id"])
+
+            scenes.append(_scene_row(record, scene_id))
+            track = _track(record["track"]) if record.get("track") else None
+            tracks.append((scene_id, track))
+        except (
+            AttributeError, EOFError, KeyError, OSError, TypeError, ValueError,
+            zipfile.BadZipFile, zlib.error,
+        ) as e:
+            raise ValueError(f"line {line_num}: {e}") from e
+
+        imported += 1
+        batch_bytes += len(scenes[-1][2]) + len(track or b"")
+        if len(scenes) >= BATCH_SIZE or batch_bytes >= BATCH_BYTES:
+            _write_batch(cur, scenes, tracks)
+            scenes, tracks, batch_bytes = [], [], 0
+
+    if not header_seen:
+        raise ValueError("empty export")
+
+    if scenes:
+        _write_batch(cur, scenes, tracks)
+
+    return imported
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Export or import the scene library")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", nargs="?", help="NDJSON file, stdin or stdout if left out")
+    parser.add_argument("--append", action="store_true", help="give imported scenes new ids")
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args(argv)
+
+    con = connect(args.db)
+    init_db(con)
+    if args.command == "export":
+        with open(args.path, "w") if args.path else sys.stdout as f:
+            for line in export_library(con.cursor()):
+                f.write(line)
+        return
+
+    with open(args.path, "rb") if args.path else sys.stdin.buffer as f:
+        count = import_library(con.cursor(), f, "append" if args.append else "replace")
+    con.commit()
+    print(f"imported {count} scenes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+from dataclasses import dataclass
 from typing import Any, Literal, TypedDict
 
 
@@ -26,3 +27,17 @@ class Program(TypedDict):
     data: str
     name: str
     fps: int
+
+
+@dataclass
+class MusicSyncSettings:
+    # onset sensitivity: flux has to rise activation_threshold * 10 standard
+    # deviations above its recent mean to count as a beat, see studio.beats
+    activation_threshold: float = 0.2
+    transition_scale: float = 0.2
+    low_range_color_scale: float = 1.0
+    mid_range_color_scale: float = 1.0
+    high_range_color_scale: float = 1.0
+    # band edges in Hz
+    low_range: int = 250
+    mid_range: int = 4000
@@ -0,0 +1,254 @@
+"""
+Output stage between the render loop and the strips.
+
+Everything draws into `FrameOutput.buffer`, the logical framebuffer described
+by the layout (see studio.layout). `show()` compares the buffer with the last
+frame that was pushed and skips the hardware write entirely when nothing
+changed. Otherwise only the dirty ranges are copied into the strips that own
+them, and backends that can do partial updates get told which ranges those
+were.
+
+With more than one strip every strip is driven by its own worker process, so
+the strips are pushed in parallel instead of one after another.
+"""
+import logging
+from multiprocessing import Event, Process, RawArray
+from time import monotonic
+
+import numpy as np
+
+from studio.layout import Layout, StripConfig
+from studio.stats import PlayerStats
+from studio.virtual import FrameCapture, VirtualStrip
+
+try:
+    import board
+    import neopixel
+except ImportError:
+    print("Couldn't import board or neopixel. Using virtual strips instead.")
+    board = None
+    neopixel = None
+
+logger = logging.getLogger(__name__)
+
+Ranges = list[tuple[int, int]]
+# longest a strip worker may take to push a frame
+WORKER_TIMEOUT = 2.0
+
+
+def dirty_ranges(changed: np.ndarray) -> Ranges:
+    """
+    Turns a boolean mask of changed LEDs into a list of [start, end) ranges.
+    """
+    edges = np.flatnonzero(np.diff(changed.astype(np.int8), prepend=0, append=0))
+    return list(zip(edges[::2].tolist(), edges[1::2].tolist()))
+
+
+def open_strip(config: StripConfig):
+    if config.backend == "virtual" or neopixel is None:
+        capture = None
+        if config.capture:
+            capture = FrameCapture(
+                config.capture, config.length, capacity=config.capture_frames
+            )
+
+        return VirtualStrip(config.length, capture)
+
+    return neopixel.NeoPixel(
+        getattr(board, config.pin), config.length, brightness=1, auto_write=False
+    )
+
+
+def push_strip(strip, buffer: np.ndarray, ranges: Ranges):
+    """
+    Copies the given ranges of `buffer` into the strip and shows it. Backends
+    that can push part of the strip implement `show_ranges(ranges)`, everything
+    else gets a full `show()`.
+    """
+    as_arrays = getattr(strip, "accepts_arrays", False)
+    for start, end in ranges:
+        values = buffer[start:end]
+        strip[start:end] = values if as_arrays else values.tolist()
+
+    if hasattr(strip, "show_ranges"):
+        strip.show_ranges(ranges)
+    else:
+        strip.show()
+
+
+class LocalStrip:
+    """
+    A strip driven from the render process itself.
+    """
+
+    def __init__(self, config: StripConfig):
+        self.config = config
+        self.strip = open_strip(config)
+
+    def push(self, pushed: np.ndarray, ranges: Ranges):
+        offset = self.config.offset
+        push_strip(self.strip, pushed[offset:offset + self.config.length], ranges)
+
+    def wait(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def _strip_worker(config: StripConfig, shared, ranges, go, done, closing):
+    strip = open_strip(config)
+    pushed = np.frombuffer(shared, dtype=np.uint8).reshape(-1, 3)
+    pushed = pushed[config.offset:config.offset + config.length]
+
+    while True:
+        go.wait()
+        go.clear()
+        if closing.is_set():
+            break
+
+        push_strip(strip, pushed, [(ranges[0], ranges[1])])
+        done.set()
+
+
+class StripWorker:
+    """
+    A strip driven by its own process. The pushed frame lives in shared memory,
+    `push` only hands over the dirty span and wakes the worker up.
+    """
+
+    def __init__(self, config: StripConfig, shared):
+        self.config = config
+        self._ranges = RawArray("l", 2)
+        self._go = Event()
+        self._done = Event()
+        self._closing = Event()
+        self._proc = Process(
+            target=_strip_worker,
+            args=(
+                config,
+                shared,
+                self._ranges,
+                self._go,
+                self._done,
+                self._closing,
+            ),
+            daemon=True,
+        )
+        self._proc.start()
+
+    def push(self, pushed: np.ndarray, ranges: Ranges):
+        # one span covering every dirty range, the worker is in another process
+        # so this keeps the handoff to two integers
+        self._ranges[0] = ranges[0][0]
+        self._ranges[1] = ranges[-1][1]
+        self._done.clear()
+        self._go.set()
+
+    def wait(self):
+        # a worker that died (say its pin can't be opened) never reports back,
+        # fail instead of blocking the render loop forever
+        deadline = monotonic() + WORKER_TIMEOUT
+        while not self._done.wait(0.1):
+            if not self._proc.is_alive():
+                raise RuntimeError(
+                    f"strip worker for pin {self.config.pin} exited with code "
+                    f"{self._proc.exitcode}"
+                )
+            if monotonic() > deadline:
+                raise TimeoutError(
+                    f"strip worker for pin {self.config.pin} didn't push within "
+                    f"{WORKER_TIMEOUT}s"
+                )
+
+    def close(self):
+        self._closing.set()
+        self._go.set()
+        self._proc.join(1.0)
+
+
+class FrameOutput:
+    """
+    Exposes the same surface as `neopixel.NeoPixel` (indexing, `fill`, `show`,
+    `len`) so programs written against the strip keep working.
+    """
+
+    def __init__(self, layout: Layout, stats: PlayerStats | None = None):
+        self.stats = stats
+        num_leds = layout.num_leds
+        self.buffer = np.zeros((num_leds, 3), dtype=np.uint8)
+
+        # what the strips are currently showing
+        if len(layout.strips) > 1:
+            shared = RawArray("B", num_leds * 3)
+            self._pushed = np.frombuffer(shared, dtype=np.uint8).reshape(num_leds, 3)
+            self.strips = [StripWorker(config, shared) for config in layout.strips]
+        else:
+            self._pushed = np.zeros_like(self.buffer)
+            self.strips = [LocalStrip(config) for config in layout.strips]
+
+        # nothing is known about the strips until the first push
+        self._stale = True
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [tuple(color) for color in self.buffer[index].tolist()]
+
+        return tuple(self.buffer[index].tolist())
+
+    def __setitem__(self, index, color):
+        self.buffer[index] = color
+
+    def fill(self, color: tuple[int, int, int]):
+        self.buffer[:] = color
+
+    def show(self):
+        if self._stale:
+            self._stale = False
+            ranges = [(0, len(self.buffer))]
+        else:
+            changed = np.any(self.buffer != self._pushed, axis=1)
+            if not changed.any():
+                self._incr("skipped_shows")
+                return
+
+            ranges = dirty_ranges(changed)
+
+        for start, end in ranges:
+            self._pushed[start:end] = self.buffer[start:end]
+
+        # start every strip first and then wait for all of them
+        pushing = []
+        for strip in self.strips:
+            strip_ranges = self._clip(ranges, strip.config)
+            if strip_ranges:
+                strip.push(self._pushed, strip_ranges)
+                pushing.append(strip)
+
+        for strip in pushing:
+            strip.wait()
+
+        self._incr("shows")
+
+    def close(self):
+        for strip in self.strips:
+            strip.close()
+
+    @staticmethod
+    def _clip(ranges: Ranges, config: StripConfig) -> Ranges:
+        """
+        The part of `ranges` that falls on the strip, relative to its first LED.
+        """
+        first, last = config.offset, config.offset + config.length
+        return [
+            (max(start, first) - first, min(end, last) - first)
+            for start, end in ranges
+            if start < last and end > first
+        ]
+
+    def _incr(self, name: str):
+        if self.stats:
+            self.stats.incr(name)
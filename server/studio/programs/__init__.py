@@ -1,13 +1,39 @@
+"""
+Programs are python modules in this package. A program defines
+
+    fps = 15                       # optional, defaults to 5
+    def setup(buf): ...            # optional, called once when it starts
+    def render(buf, t): ...        # called once per frame
+
+where `buf` is the (n_leds, 3) uint8 numpy array backing the strip and `t` is
+the number of seconds since the program started. The player shows `buf` after
+every `render`. The helpers below operate on whole arrays so programs don't
+need per-LED python loops.
+
+Programs that react to music set `uses_audio = True` and take a third
+argument, `render(buf, t, features)`, the newest record published by the audio
+worker (see studio.features for its fields). The player starts the worker for
+them.
+
+The older contract, `setup(pixels)` / `run(pixels)` against a NeoPixel-like
+object that the program shows itself, is still supported.
+"""
+from functools import cache
 import os
 import pathlib
 from random import randint
 
+import numpy as np
+
+from studio.layout import get_layout
+
 dir_path = os.path.dirname(os.path.realpath(__file__))
 programs = pathlib.Path(dir_path).glob("*.py")
 
 programs_list = [program.stem for program in programs if program.stem != "__init__"]
 
-groups = (
+# the original 40 LED tree
+tree_groups = (
     (0, 1, 2),
     (3, 4, 5),
     (6, 7, 8),
@@ -23,12 +49,48 @@ groups = (
     (37, 38, 39),
 )
 
-shelf_groups = (
-    (groups[0], groups[1]),
-    (groups[2], groups[3], groups[4], groups[5]),
-    (groups[6], groups[7], groups[8]),
-    (groups[9], groups[10], groups[11]),
-    (groups[12],),
+# indexes into tree_groups
+tree_shelves = (
+    (0, 1),
+    (2, 3, 4, 5),
+    (6, 7, 8),
+    (9, 10, 11),
+    (12,),
+)
+
+
+def _default_groups(num_leds: int) -> tuple[tuple[int, ...], ...]:
+    if num_leds == 40:
+        return tree_groups
+
+    # runs of 3 LEDs along the strip
+    return tuple(
+        tuple(range(start, min(start + 3, num_leds)))
+        for start in range(0, num_leds, 3)
+    )
+
+
+def _default_shelves(num_groups: int) -> tuple[tuple[int, ...], ...]:
+    if num_groups == len(tree_groups):
+        return tree_shelves
+
+    # 5 shelves of consecutive groups
+    return tuple(
+        tuple(shelf.tolist())
+        for shelf in np.array_split(np.arange(num_groups), min(5, num_groups))
+    )
+
+
+_layout = get_layout()
+
+if _layout.groups:
+    groups = tuple(tuple(group) for group in _layout.groups)
+else:
+    groups = _default_groups(_layout.num_leds)
+
+shelf_groups = tuple(
+    tuple(groups[group] for group in shelf)
+    for shelf in (_layout.shelf_groups or _default_shelves(len(groups)))
 )
 
 
@@ -52,6 +114,62 @@ def transition_color(
     )
 
 
+def transition_array(
+    from_: np.ndarray, to: np.ndarray | tuple[int, int, int], step: float,
+    out: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Vectorized `transition_color`: moves every color in `from_` at most `step`
+    towards `to` per channel. `to` is broadcast, so it can be a single color.
+    """
+    from_ = np.asarray(from_)
+    delta = np.clip(np.asarray(to, dtype=np.float32) - from_, -step, step)
+    result = (from_ + delta).astype(np.uint8)
+    if out is None:
+        return result
+
+    out[:] = result
+    return out
+
+
+@cache
+def group_map(groups: tuple[tuple[int, ...], ...]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns (leds, group_ids): every LED in `groups` and the index of the group
+    it belongs to, so per-group values can be expanded to LEDs with
+    `values[group_ids]`.
+    """
+    leds = np.fromiter((led for group in groups for led in group), dtype=np.intp)
+    group_ids = np.repeat(
+        np.arange(len(groups)), [len(group) for group in groups]
+    )
+    return leds, group_ids
+
+
+def fill_groups(
+    buf: np.ndarray,
+    colors: np.ndarray,
+    groups: tuple[tuple[int, ...], ...] = groups,
+):
+    """
+    Sets every LED of group n to colors[n].
+    """
+    leds, group_ids = group_map(groups)
+    buf[leds] = colors[group_ids]
+
+
+def get_random_colors(count: int) -> np.ndarray:
+    """
+    Vectorized `get_random_color`, returns a (count, 3) array.
+    """
+    colors = np.random.randint(0, 51, size=(count, 3), dtype=np.uint8)
+    dominant_color_pos = np.random.randint(0, 3, size=count)
+    colors[np.arange(count), dominant_color_pos] = np.random.randint(
+        150, 256, size=count
+    )
+    return colors
+
+
 def get_random_color():
     target_color = [randint(0, 50), randint(0, 50), randint(0, 50)]
     dominant_color_pos = randint(0, 2)
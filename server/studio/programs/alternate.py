@@ -1,4 +1,6 @@
-from . import groups
+import numpy as np
+
+from . import fill_groups, groups
 
 # settings
 fps = 1
@@ -7,23 +9,19 @@ fps = 1
 counter = 0
 
 
-def setup(pixels):
+def setup(buf):
     global counter
     counter = 0
 
 
-def run(pixels):
+def render(buf, t):
     global counter
-    for group_num, group in enumerate(groups):
-        color = [0, 0, 0]
-        pos = (counter + group_num) % 4
-        if not pos == 0:
-            color[pos - 1] = 255
-
-        for led in group:
-            pixels[led] = tuple(color)
+    colors = np.zeros((len(groups), 3), dtype=np.uint8)
+    pos = (counter + np.arange(len(groups))) % 4
+    lit = pos != 0
+    colors[lit, pos[lit] - 1] = 255
 
-    pixels.show()
+    fill_groups(buf, colors)
 
     counter += 1
     if counter > 4:
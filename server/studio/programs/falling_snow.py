@@ -1,5 +1,5 @@
 from typing import Literal
-from . import shelf_groups, transition_color, get_random_color
+from . import shelf_groups, transition_array, get_random_color
 from random import choice
 # top to bottom
 reversed_groups = list(shelf_groups)
@@ -13,18 +13,16 @@ target_color = (255, 255, 255)
 wait_counter = 0
 status: Literal["lighting", "waiting"] = "falling"
 
-def setup(pixels):
+def setup(buf):
     global current_level, wait_counter, status
     current_level = 0
     wait_counter = 0
     status = "falling"
 
-def run(pixels):
+def render(buf, t):
     global current_level, target_color, wait_counter, status
     step = int(255 * 0.1)
-    for led in range(len(pixels)):
-        if tuple(pixels[led]) != (0, 0, 0):
-            pixels[led] = transition_color(pixels[led], (0, 0, 0), step)
+    transition_array(buf, (0, 0, 0), step, out=buf)
 
     if status == "waiting":
         if wait_counter == wait_limit:
@@ -41,10 +39,7 @@ def run(pixels):
         # pick a random group from the groups on the current level
         group = choice(reversed_groups[current_level])
 
-        for led in group:
-            pixels[led] = target_color
-        
+        buf[list(group)] = target_color
+
         current_level += 1
         status = "waiting"
-
-    pixels.show()
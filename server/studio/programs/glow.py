@@ -1,10 +1,11 @@
 """
 Program that makes the tree slowly glow and fade.
 """
-from random import randint
 from typing import Literal
 
-from . import shelf_groups, transition_color
+import numpy as np
+
+from . import get_random_color, shelf_groups, transition_array
 
 # constants
 increment_percentage = 0.05
@@ -15,47 +16,43 @@ target_color = (255, 255, 255)
 step = 255 * increment_percentage
 fps = 15
 
+
 def flatten(iterable):
     return [item for sublist in iterable for item in sublist]
 
 
-def reset(pixels):
-    global target_color, step, current_shelf, current_mode
+# LEDs of every shelf, and of all shelves together
+shelf_leds = [np.array(flatten(shelf), dtype=np.intp) for shelf in shelf_groups]
+all_leds = np.concatenate(shelf_leds)
+
+
+def reset(buf):
+    global target_color, current_shelf, current_mode
     current_shelf = 0
     current_mode = "fade_to_color"
-    pixels.fill((0, 0, 0))
-    pixels.show()
+    buf[:] = 0
 
     # to avoid basically all white, we pick a more dominant color with a higher minimum
-    target_color = [randint(0, 50), randint(0, 50), randint(0, 50)]
-    dominant_color_pos = randint(0, 2)
-    target_color[dominant_color_pos] = randint(150, 255)
+    target_color = get_random_color()
 
-    # make it readonly
-    target_color = tuple(target_color)
 
+def setup(buf):
+    reset(buf)
 
 
-def setup(pixels):
-    reset(pixels)
-
-
-def run(pixels):
+def render(buf, t):
     global current_mode, current_shelf
 
     if current_mode == "fade_to_black":
-        pixel_value = pixels[0]
+        pixel_value = buf[0]
 
-        if tuple(pixel_value) == (0, 0, 0):
-            reset(pixels)
+        if not pixel_value.any():
+            reset(buf)
             return
 
-        # all pixels should be the same value at this point so iterate through all of them
-        # and transition to black
-        for led in flatten(flatten(shelf_groups)):
-            pixels[led] = transition_color(pixel_value, (0, 0, 0), step)
-
-        pixels.show()
+        # all pixels should be the same value at this point so transition all
+        # of them to black
+        buf[all_leds] = transition_array(pixel_value, (0, 0, 0), step)
 
         return
 
@@ -65,17 +62,12 @@ def run(pixels):
         current_mode = "fade_to_black"
         return
 
-    pixel_value = pixels[shelf_groups[current_shelf][0][0]]
+    leds = shelf_leds[current_shelf]
 
     # are we there yet?
-    if tuple(pixel_value) == target_color:
+    if tuple(buf[leds[0]]) == target_color:
         current_shelf += 1
         return
 
     # nope - we need to keep going
-    leds = flatten(shelf_groups[current_shelf])
-    for led in leds:
-        current_color = pixels[led]
-        pixels[led] = transition_color(current_color, target_color, step)
-
-    pixels.show()
+    buf[leds] = transition_array(buf[leds], target_color, step)
@@ -1,5 +1,6 @@
-import random
-from . import groups
+import numpy as np
+
+from . import fill_groups, groups
 
 MIN_COLOR_VALUE = 0
 MIN_GROUPS_ON = 4
@@ -8,13 +9,13 @@ MAX_GROUPS_ON = 8
 fps = 1
 
 
-def run(pixels):
-    pixels.fill((0, 0, 0))
-    groups_on = random.randint(MIN_GROUPS_ON, MAX_GROUPS_ON)
-    groups_to_turn_on = random.sample(groups, groups_on)
-    for group in groups_to_turn_on:
-        color = [random.randint(MIN_COLOR_VALUE, 255) for _ in range(3)]
-        for led in group:
-            pixels[led] = tuple(color)
+def render(buf, t):
+    buf[:] = 0
+    groups_on = np.random.randint(MIN_GROUPS_ON, MAX_GROUPS_ON + 1)
+    groups_to_turn_on = np.random.choice(len(groups), groups_on, replace=False)
 
-    pixels.show()
+    colors = np.zeros((len(groups), 3), dtype=np.uint8)
+    colors[groups_to_turn_on] = np.random.randint(
+        MIN_COLOR_VALUE, 256, size=(groups_on, 3)
+    )
+    fill_groups(buf, colors)
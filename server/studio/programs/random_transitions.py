@@ -1,26 +1,26 @@
-from . import groups, get_random_color, transition_color
+import numpy as np
 
-target_colors: list[tuple[int, int, int]]
+from . import get_random_colors, group_map, groups, transition_array
+
+target_colors: np.ndarray
 step = int(255 * 0.05)
 
-def pick_new_target(position: int):
-    global target_colors
-    target_colors[position] = get_random_color()
+leds, group_ids = group_map(groups)
+# the first LED of every group stands in for the whole group
+first_leds = np.array([group[0] for group in groups], dtype=np.intp)
 
-def setup(pixels):
-    global target_colors
-    target_colors = [get_random_color() for _ in groups]
 
-def run(pixels):
-    for pos, group in enumerate(groups):
-        target_color = target_colors[pos]
-        pixel_value = pixels[group[0]]
+def setup(buf):
+    global target_colors
+    target_colors = get_random_colors(len(groups))
 
-        if tuple(pixel_value) == target_color:
-            pick_new_target(pos)
-            continue
 
-        for led in group:
-            pixels[led] = transition_color(pixels[led], target_color, step)
+def render(buf, t):
+    # groups that reached their target pick a new one and sit still this frame
+    reached = np.all(buf[first_leds] == target_colors, axis=1)
+    target_colors[reached] = get_random_colors(np.count_nonzero(reached))
 
-    pixels.show()
\ No newline at end of file
+    moving = ~reached[group_ids]
+    buf[leds[moving]] = transition_array(
+        buf[leds[moving]], target_colors[group_ids[moving]], step
+    )
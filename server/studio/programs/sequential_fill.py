@@ -1,6 +1,6 @@
 from random import randint
 from typing import Literal
-from . import groups, transition_color
+from . import groups, transition_array
 
 current_led_group = 0
 direction: Literal[1, -1] = 1
@@ -21,13 +21,12 @@ def pick_new_target_color():
     target_color = tuple(target_color)
 
 
-def setup(pixels):
-    pixels.fill((0, 0, 0))
-    pixels.show()
+def setup(buf):
+    buf[:] = 0
 
     pick_new_target_color()
 
-def run(pixels):
+def render(buf, t):
     global current_led_group, direction
 
     if current_led_group == len(groups):
@@ -42,14 +41,11 @@ def run(pixels):
         current_led_group += direction
         return
     
-    pixel_value = pixels[groups[current_led_group][0]]
+    leds = list(groups[current_led_group])
 
-    if tuple(pixel_value) == target_color:
+    if tuple(buf[leds[0]]) == target_color:
         # we did it! move on
         current_led_group += direction
         return
     
-    for led in groups[current_led_group]:
-        pixels[led] = transition_color(pixels[led], target_color, step)
-
-    pixels.show()
+    buf[leds] = transition_array(buf[leds], target_color, step)
@@ -0,0 +1,70 @@
+"""
+Program that turns the tree into a spectrum analyzer: bass on the bottom
+shelf, treble at the top.
+
+Every group shows the level of the part of the spectrum that falls on it. The
+levels rise quickly and fall slowly, and everything is computed for all groups
+at once, so long strips cost the same handful of array operations per frame.
+"""
+import colorsys
+
+import numpy as np
+
+from studio.features import N_BANDS
+
+from . import fill_groups, shelf_groups
+
+fps = 60
+uses_audio = True
+
+# time constants of the smoothing in seconds
+attack = 0.03
+decay = 0.25
+# the loudest level seen decays towards the current one over this many seconds
+gain_decay = 5.0
+
+# groups from the bottom shelf to the top one
+ordered_groups = tuple(group for shelf in shelf_groups for group in shelf)
+n_groups = len(ordered_groups)
+
+# where every group falls on the spectrum, interpolated between the bands
+band_positions = np.linspace(0, N_BANDS - 1, n_groups)
+# red at the bottom through to violet at the top
+palette = np.array(
+    [colorsys.hsv_to_rgb(0.8 * i / max(n_groups - 1, 1), 1, 1) for i in range(n_groups)],
+    dtype=np.float32,
+) * 255
+
+levels = np.zeros(n_groups, dtype=np.float32)
+colors = np.zeros((n_groups, 3), dtype=np.uint8)
+loudest = 1.0
+last_t = 0.0
+
+
+def setup(buf):
+    global loudest, last_t
+    levels[:] = 0
+    loudest = 1.0
+    last_t = 0.0
+    buf[:] = 0
+
+
+def render(buf, t, features):
+    global loudest, last_t
+    dt = max(t - last_t, 0)
+    last_t = t
+
+    spectrum = features["spectrum"]
+    target = np.interp(band_positions, np.arange(N_BANDS), spectrum)
+
+    # automatic gain: scale to the loudest band seen recently
+    loudest = max(float(spectrum.max()), loudest * np.exp(-dt / gain_decay), 1e-3)
+    target /= loudest
+
+    # fast attack, slow decay, both independent of the frame rate
+    rate = np.where(target > levels, 1 - np.exp(-dt / attack), 1 - np.exp(-dt / decay))
+    levels[:] += rate * (target - levels)
+
+    # squared so quiet groups stay dim and the peaks stand out
+    np.multiply(palette, np.square(levels)[:, None], out=colors, casting="unsafe")
+    fill_groups(buf, colors, ordered_groups)
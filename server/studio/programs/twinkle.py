@@ -1,49 +1,47 @@
-from colour import Color
-from random import choice
-from . import groups
+import colorsys
+
+import numpy as np
+
+from . import fill_groups, groups
 
 fps = 15
 
 # orangish color
-base_color = Color(rgb=(227/255, 165/255, 50/255))
+base_color = (227 / 255, 165 / 255, 50 / 255)
 
 min_luminance = 0.2
 max_luminance = 0.6
 change_amt = 0.01
 
-# because of float math errors, we want to work with the color object and not convert from float -> int -> float
-pixel_colors: list[Color] = []
+# every group keeps the hue and saturation of the base color and only its
+# luminance (HSL lightness) changes. we keep the luminance as floats rather
+# than converting from float -> int -> float every frame
+hue, base_luminance, saturation = colorsys.rgb_to_hls(*base_color)
+group_luminance = np.full(len(groups), base_luminance)
+
+# per channel factor of the HSL -> RGB conversion for a fixed hue
+_k = (np.array([0, 8, 4]) + hue * 12) % 12
+hue_factors = np.clip(np.minimum(_k - 3, 9 - _k), -1, 1)
+
 
-def color_to_pixel_rgb(c: Color) -> tuple[int, int, int]:
-    return (int(c.get_red() * 255), int(c.get_green() * 255), int(c.get_blue() * 255))
+def luminance_to_rgb(luminance: np.ndarray) -> np.ndarray:
+    chroma = saturation * np.minimum(luminance, 1 - luminance)
+    rgb = luminance[:, None] - chroma[:, None] * hue_factors
+    return (rgb * 255).astype(np.uint8)
 
-def setup(pixels):
-    global pixel_colors
-    pixel_colors = [base_color] * len(pixels)
+
+def setup(buf):
     # all start off the same color
-    pixels.fill(color_to_pixel_rgb(base_color))
-    pixels.show()
-
-def run(pixels):
-    global pixel_colors
-    for group in groups:
-        group_color = pixel_colors[group[0]]
-        luminance = group_color.get_luminance()
-        # don't let it get too dark
-        if luminance < min_luminance:
-            group_color.set_luminance(luminance + (luminance * change_amt))
-        elif luminance > max_luminance:
-            group_color.set_luminance(luminance - (luminance * change_amt))
-        else:
-            # pick a random amount
-            coefficient = choice((1, -1))
-            group_color.set_luminance(luminance + ((luminance * change_amt) * coefficient))
-
-        # set all leds in the group to that color
-        for led in group:
-            pixels[led] = color_to_pixel_rgb(group_color)
-            # save the new color
-            pixel_colors[led] = group_color
-
-    pixels.show()
+    group_luminance[:] = base_luminance
+    buf[:] = luminance_to_rgb(np.array([base_luminance]))[0]
+
+
+def render(buf, t):
+    # don't let it get too dark or too bright, otherwise pick a random direction
+    direction = np.random.choice((1, -1), size=len(groups))
+    direction[group_luminance < min_luminance] = 1
+    direction[group_luminance > max_luminance] = -1
+    group_luminance[:] += group_luminance * change_amt * direction
 
+    # set all leds in the group to that color
+    fill_groups(buf, luminance_to_rgb(group_luminance))
@@ -0,0 +1,69 @@
+"""
+LRU cache of compiled scenes, keyed by scene id and version.
+
+The player process keeps the compiled frames of the last scenes it played, up
+to `SCENE_CACHE_MB` megabytes (64 unless the environment variable says
+otherwise). The web process keeps a shadow copy of the same cache holding only
+the sizes: both see the same puts and gets in the same order, through the
+player's message queue, so the shadow knows exactly which scenes the player
+still has. Playing one of those only sends its key.
+
+A new version of a scene is a new key, old versions are never asked for again
+and fall out at the end of the LRU.
+"""
+from collections import OrderedDict
+import os
+
+import numpy as np
+
+SCENE_CACHE_BYTES = int(os.environ.get("SCENE_CACHE_MB", 64)) * 2**20
+
+# (scene id, version)
+SceneKey = tuple[int, int]
+
+
+class SceneCache:
+    def __init__(self, max_bytes: int = SCENE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        # key -> (frames or None in the shadow, size in bytes)
+        self._entries: OrderedDict[SceneKey, tuple[np.ndarray | None, int]] = OrderedDict()
+
+    def __contains__(self, key: SceneKey) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: SceneKey) -> np.ndarray | None:
+        """
+        The frames stored under `key`, which becomes the most recently used.
+        """
+        if key not in self._entries:
+            return None
+
+        self._entries.move_to_end(key)
+        return self._entries[key][0]
+
+    def put(self, key: SceneKey, frames: np.ndarray | None, nbytes: int | None = None):
+        """
+        Stores frames, or only their size in the shadow, evicting the least
+        recently used scenes to make room. Scenes bigger than the whole cache
+        are not stored.
+        """
+        if nbytes is None:
+            nbytes = frames.nbytes
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+
+        while self.nbytes + nbytes > self.max_bytes:
+            self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+        self._entries[key] = (frames, nbytes)
+        self.nbytes += nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
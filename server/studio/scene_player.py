@@ -1,39 +1,36 @@
-from dataclasses import dataclass
 import importlib
 import logging
 from multiprocessing import Process, Queue
-from time import sleep
-from typing import Literal
+from queue import Empty
+import threading
+from time import monotonic
+from typing import Callable, Literal
 import numpy as np
-import sounddevice as sd
 
-from studio.models import Frame, Scene
+from studio.audio_worker import AudioWorker
+from studio.features import AudioFeatures
+from studio.framebuffer import SharedFrameBuffer
+from studio.latency import LatencyTracker, read_latency
+from studio.frames import compile_frames, fit_frames
+from studio.layout import NUM_LEDS, get_layout
+from studio.models import Frame, MusicSyncSettings, Scene
+from studio.output import FrameOutput
+from studio.scene_cache import SceneCache, SceneKey
+from studio.scheduler import FramePolicy, FrameScheduler
+from studio.stats import PlayerStats
+from studio.tracks import FeatureTrack
 from .programs import transition_color
 
-try:
-    import board
-    import neopixel
-except ImportError:
-    print("Couldn't import board or neopixel. Using stubs instead.")
-    import studio.stubs.board as board
-    import studio.stubs.neopixel as neopixel
-
 Actions = Literal[
-    "play", "pause", "set_frames", "set_leds", "stop", "terminate", "step_program", "sync_music"
+    "play", "pause", "set_frames", "set_leds", "stop", "terminate", "step_program", "sync_music",
+    "show_framebuffer", "set_track", "update_music_settings"
 ]
-Mode = Literal["scene", "program", "idle", "music"]
+Mode = Literal["scene", "program", "idle", "music", "preview", "track"]
 
-logger = logging.getLogger(__name__)
+# music scenes are drawn at this rate from their feature track
+TRACK_FPS = 30
 
-@dataclass
-class MusicSyncSettings:
-    activation_threshold: float = 0.2
-    transition_scale: float = 0.2
-    low_range_color_scale: float = 1.0
-    mid_range_color_scale: float = 1.0
-    high_range_color_scale: float = 1.0
-    low_range: int = 50
-    mid_range: int = 500
+logger = logging.getLogger(__name__)
 
 
 class Message:
@@ -59,11 +56,20 @@ class StopMessage(Message):
 
 
 class SetSceneMessage(Message):
-    def __init__(self, frames: list[Frame], fps: int, brightness: float):
+    # without frames the player takes them from its scene cache, see
+    # studio.scene_cache
+    def __init__(
+        self,
+        frames: np.ndarray | None,
+        fps: int,
+        brightness: float,
+        key: SceneKey | None = None,
+    ):
         super().__init__(type="set_frames")
         self.frames = frames
         self.fps = fps
         self.brightness = brightness
+        self.key = key
 
 
 class SetLedsMessage(Message):
@@ -72,10 +78,10 @@ class SetLedsMessage(Message):
         self.leds = leds
 
 
-class SetFrameMessage(Message):
-    def __init__(self, frame: Frame):
-        super().__init__(type="set_frame")
-        self.frame = frame
+class ShowFramebufferMessage(Message):
+    # the frame itself is passed through the shared framebuffer
+    def __init__(self):
+        super().__init__(type="show_framebuffer")
 
 
 class SetProgramMessage(Message):
@@ -94,41 +100,50 @@ class SyncMusicMessage(Message):
         self.settings = settings
 
 
-def normalize(data):
-    return (data - np.min(data)) / (np.max(data) - np.min(data))
+class UpdateMusicSettingsMessage(Message):
+    # swaps the settings of a running music sync or music scene in place
+    def __init__(self, settings: MusicSyncSettings):
+        super().__init__(type="update_music_settings")
+        self.settings = settings
 
-sample_size = 1024
 
-def sync_music(stream: sd.InputStream, pixels: neopixel.NeoPixel, music_sync_settings: MusicSyncSettings):
+class SetTrackMessage(Message):
+    # the player publishes `number` as the ended_track stat when the track
+    # has played to its end
+    def __init__(self, track: FeatureTrack, settings: MusicSyncSettings, number: int):
+        super().__init__(type="set_track")
+        self.track = track
+        self.settings = settings
+        self.number = number
+
+
+def sync_music(
+    features: np.ndarray,
+    onset: bool,
+    pixels: FrameOutput,
+    music_sync_settings: MusicSyncSettings,
+):
+    """
+    `features` is the newest record from the audio worker, see
+    studio.features, and `onset` whether there was a beat since the last frame.
+    Draws the frame, the caller shows it.
+    """
     step = int(255 * music_sync_settings.transition_scale)
-    audio_data, _ = stream.read(sample_size)
 
-    if np.max(audio_data) < 0.0001:
+    if features["peak"] < 0.0001:
         current_color = pixels[0]
         if tuple(current_color) != (0, 0, 0):
             next_color = transition_color(current_color, (0, 0, 0), step)
             pixels.fill(next_color)
-            pixels.show()
         return
 
-    # get the frequencies
-    freq_data = np.fft.fft(audio_data)
-
-    # get amplitudes of each frequency
-    amplitudes = 1 / sample_size * np.abs(freq_data)
+    # get the average volume of bass/vocals/treble
+    bass_volume = float(features["bass"])
+    vocals_volume = float(features["mid"])
+    treble_volume = float(features["treble"])
 
-    # split amplitudes into bass/vocals/treble
-    bass_amplitudes = normalize(amplitudes[:music_sync_settings.low_range])
-    vocals_amplitudes = normalize(amplitudes[music_sync_settings.low_range:music_sync_settings.mid_range])
-    treble_amplitudes = normalize(amplitudes[music_sync_settings.mid_range:])
-
-    # get the average volume of each frequency range
-    bass_volume = np.mean(bass_amplitudes)
-    vocals_volume = np.mean(vocals_amplitudes)
-    treble_volume = np.mean(treble_amplitudes)
-
-    # if significant bass volume, trigger LEDs
-    if bass_volume > music_sync_settings.activation_threshold:
+    # trigger the LEDs on every onset
+    if onset:
         color = (
             min(int(bass_volume * 255 * music_sync_settings.low_range_color_scale), 255),
             min(int(vocals_volume * 255 * music_sync_settings.mid_range_color_scale), 255),
@@ -144,143 +159,268 @@ def sync_music(stream: sd.InputStream, pixels: neopixel.NeoPixel, music_sync_set
             next_color = transition_color(current_color, (0, 0, 0), step)
             pixels.fill(next_color)
 
-    pixels.show()
-
-
-def _show_frame(pixels: neopixel.NeoPixel, frame: Frame):
-    for led_num in range(len(pixels)):
-        led_state = frame["ledStates"].get(str(led_num), {"r": 0, "g": 0, "b": 0})
-        rgb = (led_state["r"], led_state["g"], led_state["b"])
-        if tuple(pixels[led_num]) != rgb:
-            pixels[led_num] = rgb
 
+def _show_frame(pixels: FrameOutput, frame: np.ndarray):
+    # frame is a compiled (n_leds, 3) array, see studio.frames
+    pixels.buffer[:] = frame
     pixels.show()
 
 
-def _run_loop(inputQueue: Queue):
-    pixels = neopixel.NeoPixel(board.D18, 40, brightness=1, auto_write=False)
+def _run_loop(
+    inputQueue: Queue,
+    framebuffer: SharedFrameBuffer,
+    features: AudioFeatures,
+    stats: PlayerStats,
+    frame_policy: FramePolicy,
+):
+    # everything draws into the output stage, which maps the frame onto the
+    # strips and only pushes to them when it actually changed
+    pixels = FrameOutput(get_layout(), stats)
     mode: Mode = "idle"
-    frames: list[Frame] = []
+    frames = np.zeros((0, NUM_LEDS, 3), dtype=np.uint8)
+    # compiled scenes played recently, mirrored by ScenePlayer._scene_cache
+    scene_cache = SceneCache()
+    # the newest frame read from the shared framebuffer
+    live_frame = np.zeros((NUM_LEDS, 3), dtype=np.uint8)
 
-    # music stuff
-    audio_stream: sd.InputStream | None = None
+    # music stuff, the audio worker process does the analysis
     music_sync_settings: MusicSyncSettings | None = None
+    audio_features = AudioFeatures.empty()
+    beats_seen = 0
+    latency = LatencyTracker(stats)
+    # music scenes: the precomputed track and how far into it we are
+    track: FeatureTrack | None = None
+    track_start = 0.0
+    track_time = 0.0
+    track_number = 0
 
     playing = False
     current_frame = 0
     fps = 5
     program_func = None
-
-    def full_reset():
-        nonlocal mode, playing, current_frame, frames, program_func, fps
+    # programs using the array contract, see studio.programs
+    program_vectorized = False
+    program_uses_audio = False
+    program_start = 0.0
+    scheduler = FrameScheduler(frame_policy, stats)
+
+    def full_reset(blackout: bool = True):
+        nonlocal mode, playing, current_frame, frames, program_func, fps, track
         mode = "idle"
         playing = False
+        scheduler.stop()
         current_frame = 0
-        frames = []
-        pixels.fill((0, 0, 0))
-        pixels.show()
+        frames = frames[:0]
+        if blackout:
+            pixels.fill((0, 0, 0))
+            pixels.show()
         program_func = None
         fps = 5
-
-        if audio_stream:
-            audio_stream.close()
+        track = None
 
     def init_audio(settings: MusicSyncSettings):
-        nonlocal audio_stream, fps, mode, playing, music_sync_settings
-        if audio_stream:
-            try:
-                audio_stream.close()
-            except Exception:
-                pass
-
+        nonlocal fps, mode, playing, music_sync_settings, beats_seen
         mode = "music"
-        audio_stream = sd.InputStream(
-            device=0,
-            channels=1,
-            samplerate=48000
-        )
-        audio_stream.start()
         fps = 24
         playing = True
         music_sync_settings = settings
+        # only beats detected from now on trigger the LEDs
+        features.read(out=audio_features)
+        beats_seen = int(audio_features["beat_count"])
+
+    def read_audio() -> bool:
+        """
+        Copies the newest audio features, returns whether there was a beat
+        since the last call.
+        """
+        features.read(out=audio_features)
+        return count_beats()
+
+    def read_track() -> bool:
+        """
+        Looks up the features of the current track position, same as
+        `read_audio` but from the track instead of the audio worker.
+        """
+        nonlocal track_time
+        track_time = monotonic() - track_start
+        track.features_at(track_time, audio_features, start=track_start)
+        return count_beats()
+
+    def count_beats() -> bool:
+        nonlocal beats_seen
+        beat_count = int(audio_features["beat_count"])
+        onset = beat_count > beats_seen
+        beats_seen = beat_count
+        return onset
 
     def save_error(e: Exception):
         logger.error(e)
 
+    def active() -> bool:
+        if not playing or mode == "idle":
+            return False
+
+        return mode != "scene" or len(frames) > 0
+
     def run_program():
         # a program consist of a python file that defines a function called
-        # "run" that returns a list of led states
-        nonlocal mode, pixels, program_func
-        program_func(pixels)
+        # "render" that draws into the output buffer, or a legacy "run" that
+        # draws into the pixels and shows them itself
+        if program_uses_audio:
+            features.read(out=audio_features)
+            program_func(pixels.buffer, monotonic() - program_start, audio_features)
+            pixels.show()
+        elif program_vectorized:
+            program_func(pixels.buffer, monotonic() - program_start)
+            pixels.show()
+        else:
+            program_func(pixels)
 
     try:
         while True:
-            # check for messages
-            if not inputQueue.empty():
-                message: Message = inputQueue.get(block=False)
+            # block on the command channel until the next frame is due. when
+            # there is nothing to animate, block until the next command arrives
+            try:
+                message: Message | None = inputQueue.get(
+                    timeout=scheduler.remaining() if active() else None
+                )
+            except Empty:
+                message = None
+
+            if message is not None:
                 logger.debug(f"handling message: {message}")
 
                 if isinstance(message, PlayMessage):
                     playing = True
+                    if track:
+                        # pick the track up where it was paused
+                        track_start = monotonic() - track_time
                 elif isinstance(message, PauseMessage):
                     playing = False
+                    scheduler.stop()
                 elif isinstance(message, SetSceneMessage):
-                    mode = "scene"
-                    current_frame = 0
-                    frames = message.frames
-                    fps = message.fps
+                    if message.frames is None:
+                        scene_frames = scene_cache.get(message.key)
+                        if scene_frames is not None:
+                            stats.incr("scene_cache_hits")
+                    else:
+                        scene_frames = message.frames
+                        if message.key:
+                            scene_cache.put(message.key, scene_frames)
+                            stats.incr("scene_cache_misses")
+                    stats.set("scene_cache_bytes", scene_cache.nbytes)
+
+                    if scene_frames is None:
+                        # only if the shadow cache got out of step with ours
+                        logger.error(f"scene {message.key} is not in the scene cache")
+                        stats.incr("scene_cache_misses")
+                        full_reset()
+                    else:
+                        mode = "scene"
+                        scheduler.stop()
+                        current_frame = 0
+                        frames = scene_frames
+                        fps = message.fps
                 elif isinstance(message, SetLedsMessage):
                     full_reset()
                     mode = "scene"
                     pixels[:] = message.leds
                     pixels.show()
-                elif isinstance(message, SetFrameMessage):
-                    full_reset()
-                    mode = "scene"
-                    _show_frame(pixels, message.frame)
+                elif isinstance(message, ShowFramebufferMessage):
+                    # the preview frame replaces whatever is showing, so don't
+                    # black out the strip first
+                    if mode != "preview":
+                        full_reset(blackout=False)
+                        mode = "preview"
+
+                    # latest wins: frames published while we were busy are
+                    # dropped and only the newest one is shown
+                    while framebuffer.pending > 0:
+                        seq = framebuffer.read(out=live_frame)
+                        stats.incr("preview_frames")
+                        stats.incr("preview_dropped", seq - framebuffer.consumed - 1)
+                        _show_frame(pixels, live_frame)
+                        framebuffer.ack(seq)
                 elif isinstance(message, TerminateMessage):
                     break
                 elif isinstance(message, SetProgramMessage):
                     full_reset()
                     mode = "program"
                     program_module = importlib.import_module(message.program)
+                    program_vectorized = hasattr(program_module, "render")
+                    program_uses_audio = getattr(program_module, "uses_audio", False)
                     if hasattr(program_module, "setup"):
-                        program_module.setup(pixels)
+                        program_module.setup(
+                            pixels.buffer if program_vectorized else pixels
+                        )
 
                     if hasattr(program_module, "fps"):
                         fps = program_module.fps
 
-                    program_func = program_module.run
+                    if program_vectorized:
+                        program_func = program_module.render
+                    else:
+                        program_func = program_module.run
+                    program_start = monotonic()
 
                 elif isinstance(message, StopMessage):
                     full_reset()
                 elif isinstance(message, SyncMusicMessage):
                     full_reset()
                     init_audio(message.settings)
+                elif isinstance(message, UpdateMusicSettingsMessage):
+                    if mode in ("music", "track"):
+                        music_sync_settings = message.settings
+                elif isinstance(message, SetTrackMessage):
+                    full_reset()
+                    mode = "track"
+                    playing = True
+                    fps = TRACK_FPS
+                    music_sync_settings = message.settings
+                    track = message.track
+                    track_number = message.number
+                    track_start = monotonic()
+                    track_time = 0.0
+                    beats_seen = 0
 
             # animations
-            if not playing or mode == "idle":
-                # sleep for a tiny bit just to not hog the CPU
-                sleep(0.01)
+            if not active():
+                continue
+
+            if scheduler.deadline is None:
+                scheduler.start(fps)
+            elif scheduler.remaining() > 0:
+                # woken up by a command before the frame is due
                 continue
 
             if mode == "program":
                 run_program()
             elif mode == "music":
-                sync_music(audio_stream, pixels, music_sync_settings)
+                onset = read_audio()
+                sync_music(audio_features, onset, pixels, music_sync_settings)
+                built_at = monotonic()
+                pixels.show()
+                latency.record_frame(audio_features, built_at, monotonic(), onset)
+            elif mode == "track":
+                if monotonic() - track_start >= track.duration:
+                    stats.set("ended_track", track_number)
+                    full_reset()
+                    continue
+                sync_music(audio_features, read_track(), pixels, music_sync_settings)
+                pixels.show()
             else:
-                frame = frames[current_frame]
+                _show_frame(pixels, frames[current_frame])
                 current_frame += 1
-                if current_frame >= len(frames):
-                    current_frame = 0
-
-                _show_frame(pixels, frame)
 
-            # sleep
-            sleep(1 / fps)
+            dropped = scheduler.advance()
+            if mode == "scene":
+                # keep the scene on the wall clock by skipping dropped frames
+                current_frame = (current_frame + dropped) % len(frames)
     except Exception as e:
         save_error(e)
         raise e
+    finally:
+        pixels.close()
 
 
 class ScenePlayer:
@@ -290,6 +430,29 @@ class ScenePlayer:
     _current_program: str | None = None
     _syncing_music: bool
     _is_playing: bool = False
+    # numbers the tracks sent to the player, and the one that is playing
+    _track_number: int = 0
+    _playing_track: int | None = None
+    _stats: PlayerStats
+    _framebuffer: SharedFrameBuffer | None = None
+    _features: AudioFeatures | None = None
+    _audio_worker: AudioWorker | None = None
+
+    def __init__(
+        self,
+        frame_policy: FramePolicy = "drop",
+        music_settings: MusicSyncSettings | None = None,
+    ):
+        """
+        `music_settings` should be the saved ones, they are only replaced
+        when the settings are changed or music sync starts.
+        """
+        self._frame_policy = frame_policy
+        # guards the scene cache and the process it mirrors, see set_scene
+        self._scene_lock = threading.RLock()
+        # used for programs that react to music without music sync running
+        self._music_settings = music_settings or MusicSyncSettings()
+        self.reset()
 
     def _check_process(self):
         if self._proc.is_alive():
@@ -298,7 +461,7 @@ class ScenePlayer:
         logger.error("RunLoop process is not alive. resetting...")
         self.reset()
 
-    def reset(self):
+    def _terminate(self):
         if self._proc and self._proc.is_alive():
             self._input_queue.put(TerminateMessage())
             try:
@@ -307,25 +470,70 @@ class ScenePlayer:
                 if self._proc.is_alive():
                     self._proc.kill()
 
-        self._input_queue = Queue()
-        self._current_scene = None
-        self._is_playing = False
-        self._syncing_music = False
-        self._proc = Process(target=_run_loop, args=(self._input_queue,))
-        self._proc.start()
+    def _start_audio(self, settings: MusicSyncSettings):
+        self._stop_audio()
+        self._audio_worker = AudioWorker(self._features, settings)
+
+    def _stop_audio(self):
+        if self._audio_worker:
+            self._audio_worker.stop()
+            self._audio_worker = None
+
+    def reset(self):
+        with self._scene_lock:
+            self._terminate()
+            self._stop_audio()
+
+            self._input_queue = Queue()
+            # what the new player process has cached, see studio.scene_cache
+            self._scene_cache = SceneCache()
+            self._current_scene = None
+            self._is_playing = False
+            self._playing_track = None
+            self._syncing_music = False
+            self._stats = PlayerStats()
+            if self._framebuffer:
+                self._framebuffer.close()
+            self._framebuffer = SharedFrameBuffer(NUM_LEDS)
+            if self._features:
+                self._features.close()
+            self._features = AudioFeatures()
+            self._proc = Process(
+                target=_run_loop,
+                args=(
+                    self._input_queue,
+                    self._framebuffer,
+                    self._features,
+                    self._stats,
+                    self._frame_policy,
+                ),
+            )
+            self._proc.start()
+
+    def close(self):
+        """
+        Stops the player process for good and releases the shared memory.
+        """
+        self._terminate()
+        self._stop_audio()
+        if self._framebuffer:
+            self._framebuffer.close()
+            self._framebuffer = None
+        if self._features:
+            self._features.close()
+            self._features = None
 
     def clear(self):
         self._check_process()
 
         self._input_queue.put(StopMessage())
+        self._stop_audio()
         self._current_scene = None
         self._current_program = None
         self._is_playing = False
+        self._playing_track = None
         self._syncing_music = False
 
-    def __init__(self):
-        self.reset()
-
     def play(self):
         self._check_process()
 
@@ -338,22 +546,73 @@ class ScenePlayer:
         self._input_queue.put(PauseMessage())
         self._is_playing = False
 
-    def play_scene(self, scene: Scene):
-        self._check_process()
-        self.set_scene(scene)
+    def play_scene(
+        self,
+        scene: Scene,
+        frames: np.ndarray | None = None,
+        version: int | None = None,
+        load_frames: Callable[[], np.ndarray] | None = None,
+    ):
+        self.set_scene(scene, frames, version, load_frames)
         self.play()
 
-    def set_scene(self, scene: Scene):
+    def set_scene(
+        self,
+        scene: Scene,
+        frames: np.ndarray | None = None,
+        version: int | None = None,
+        load_frames: Callable[[], np.ndarray] | None = None,
+    ):
+        """
+        The scene's frames are `frames`, or what `load_frames()` returns, or
+        compiled from the scene, whichever comes first. With a `version` the
+        player caches the compiled scene, and they aren't needed while it
+        has it: `load_frames` is only called on a miss.
+        """
+        # the shadow cache has to see the puts and gets in the order the
+        # player does, so checking it and sending can't interleave with
+        # another request
+        with self._scene_lock:
+            self._check_process()
+            self.clear()
+            key = (scene["id"], version) if version is not None else None
+            if key in self._scene_cache:
+                # touched like the player will when it gets the message
+                self._scene_cache.get(key)
+                frames = None
+            else:
+                if frames is None and load_frames:
+                    frames = load_frames()
+                if frames is None:
+                    # compile in this process so the player only has to slice-assign
+                    frames = compile_frames(scene.get("frames"), NUM_LEDS)
+                frames = fit_frames(frames, NUM_LEDS)
+                if key:
+                    self._scene_cache.put(key, None, frames.nbytes)
+
+            self._input_queue.put(
+                SetSceneMessage(
+                    frames=frames,
+                    fps=scene.get("fps"),
+                    brightness=scene.get("brightness"),
+                    key=key,
+                )
+            )
+            self._current_scene = scene
+
+    def play_track(self, scene: Scene, track: FeatureTrack, settings: MusicSyncSettings):
+        """
+        Plays a music scene: the lights follow the scene's precomputed
+        feature track from now on, see studio.tracks.
+        """
         self._check_process()
         self.clear()
-        self._input_queue.put(
-            SetSceneMessage(
-                frames=scene.get("frames"),
-                fps=scene.get("fps"),
-                brightness=scene.get("brightness"),
-            )
-        )
+
+        self._track_number += 1
+        self._input_queue.put(SetTrackMessage(track, settings, self._track_number))
         self._current_scene = scene
+        self._is_playing = True
+        self._playing_track = self._track_number
 
     def set_leds(self, leds: list[tuple[int, int, int]]):
         self._check_process()
@@ -362,20 +621,74 @@ class ScenePlayer:
         self._input_queue.put(SetLedsMessage(leds=leds))
 
     def set_frame(self, frame: Frame):
+        """
+        Live preview of a single frame. Frames sent faster than the player can
+        show them are coalesced, only the newest one is drawn.
+        """
         self._check_process()
-        self.clear()
 
-        self._input_queue.put(SetFrameMessage(frame=frame))
+        # no StopMessage: the player leaves whatever mode it is in when it
+        # handles the wakeup, without blacking out the strip
+        self._stop_audio()
+        self._current_scene = None
+        self._current_program = None
+        self._is_playing = False
+        self._playing_track = None
+        self._syncing_music = False
+
+        # write the pixels straight into shared memory, the message only wakes
+        # up the player. if it hasn't caught up with the previous frame yet a
+        # wakeup is already queued and it will pick up this frame instead
+        seq = self._framebuffer.write_frame(frame)
+        if self._framebuffer.consumed == seq - 1:
+            self._input_queue.put(ShowFramebufferMessage())
+
+    def show_frame(self, scene: Scene, frame_num: int):
+        self.set_frame(scene["frames"][frame_num])
 
     def get_state(self):
         self._check_process()
 
+        if (
+            self._playing_track is not None
+            and self._stats.get("ended_track") == self._playing_track
+        ):
+            # the player went idle at the end of the track
+            self._is_playing = False
+            self._playing_track = None
+
         return {
             "is_playing": self._is_playing,
             "current_scene": self._current_scene,
             "current_program": self._current_program,
         }
 
+    def get_stats(self) -> dict[str, float]:
+        self._check_process()
+
+        stats = self._stats.as_dict()
+        stats["preview_pending"] = self._framebuffer.pending
+        if self._audio_worker:
+            features = AudioFeatures.empty()
+            self._features.read(out=features)
+            stats["beats"] = int(features["beat_count"])
+            stats["bpm"] = float(features["bpm"])
+        try:
+            stats["queue_depth"] = self._input_queue.qsize()
+        except NotImplementedError:
+            # macOS doesn't implement sem_getvalue
+            pass
+
+        return stats
+
+    def get_latency(self) -> dict[str, dict[str, float]]:
+        """
+        Rolling audio to light latency percentiles of music sync in ms, see
+        studio.latency.
+        """
+        self._check_process()
+        return read_latency(self._stats.as_dict())
+
     def stop(self):
         self._check_process()
         self.clear()
@@ -386,14 +699,30 @@ class ScenePlayer:
 
         # ensure we can import it
         name = "studio.programs." + program_name
-        importlib.import_module(name)
+        program_module = importlib.import_module(name)
+        if getattr(program_module, "uses_audio", False):
+            self._start_audio(self._music_settings)
 
         self._input_queue.put(SetProgramMessage(program=name))
         self.play()
         self._current_program = program_name
     
+    def update_music_settings(self, settings: MusicSyncSettings):
+        """
+        Applies new music sync settings to whatever is using them right now,
+        without restarting the audio stream or blacking out the strip.
+        """
+        self._check_process()
+
+        self._music_settings = settings
+        if self._audio_worker:
+            self._audio_worker.update_settings(settings)
+        self._input_queue.put(UpdateMusicSettingsMessage(settings))
+
     def sync_music(self, settings: MusicSyncSettings):
         self._check_process()
         self.clear()
         self._syncing_music = True
+        self._music_settings = settings
+        self._start_audio(settings)
         self._input_queue.put(SyncMusicMessage(settings))
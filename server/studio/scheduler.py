@@ -0,0 +1,88 @@
+"""
+Deadline based frame pacing for the render loop.
+
+Sleeping `1 / fps` after every frame makes the real period render time plus
+sleep time. Instead, each frame gets a target time on the monotonic clock and
+only the time left until that target is slept.
+"""
+from time import monotonic, sleep
+from typing import Literal
+
+from studio.stats import PlayerStats
+
+# what to do once we fall behind schedule:
+#   catch_up - render the missed frames back to back until we are on time again
+#   drop     - skip the missed frames and continue from the current time slot
+FramePolicy = Literal["catch_up", "drop"]
+
+
+class FrameScheduler:
+    period: float = 1 / 5
+    deadline: float | None = None
+
+    def __init__(
+        self,
+        policy: FramePolicy = "drop",
+        stats: PlayerStats | None = None,
+        max_lag: float = 1.0,
+    ):
+        self.policy = policy
+        self.stats = stats
+        # even when catching up, never try to replay more than this many seconds
+        self.max_lag = max_lag
+
+    def start(self, fps: float):
+        """
+        (Re)starts pacing at the given fps. The first frame is due immediately.
+        """
+        self.period = 1 / fps
+        self.deadline = monotonic()
+
+    def stop(self):
+        self.deadline = None
+
+    def remaining(self) -> float:
+        """
+        Seconds left until the next frame is due. 0 if it is already due.
+        """
+        if self.deadline is None:
+            return 0
+
+        return max(self.deadline - monotonic(), 0)
+
+    def wait(self):
+        remaining = self.remaining()
+        if remaining > 0:
+            sleep(remaining)
+
+    def advance(self) -> int:
+        """
+        Called once a frame has been rendered. Moves the deadline to the next
+        frame and returns how many frames were dropped to get back on schedule.
+        """
+        if self.deadline is None:
+            return 0
+
+        self.deadline += self.period
+        self._incr("frames")
+
+        lag = monotonic() - self.deadline
+        if lag <= 0:
+            return 0
+
+        # the frame took longer than its budget
+        self._incr("late_frames")
+
+        if self.policy == "catch_up" and lag < self.max_lag:
+            return 0
+
+        missed = int(lag / self.period)
+        if missed:
+            self.deadline += missed * self.period
+            self._incr("dropped_frames", missed)
+
+        return missed
+
+    def _incr(self, name: str, amount: int = 1):
+        if self.stats:
+            self.stats.incr(name, amount)
@@ -0,0 +1,60 @@
+from multiprocessing import Array
+
+# music sync latency, published as rolling percentiles in milliseconds, see
+# studio.latency
+LATENCY_STAGES = ("analysis", "render", "show", "total", "beat")
+LATENCY_PERCENTILES = (50, 90, 99)
+
+STAT_NAMES = (
+    "frames",
+    "late_frames",
+    "dropped_frames",
+    "preview_frames",
+    "preview_dropped",
+    "shows",
+    "skipped_shows",
+    # see studio.scene_cache
+    "scene_cache_hits",
+    "scene_cache_misses",
+    "scene_cache_bytes",
+    # the last music scene track that played to its end, see
+    # ScenePlayer.play_track
+    "ended_track",
+) + tuple(
+    f"latency_{stage}_p{percentile}"
+    for stage in LATENCY_STAGES
+    for percentile in LATENCY_PERCENTILES
+) + tuple(
+    # how many samples the percentiles of a stage are over, 0 until it has any
+    f"latency_{stage}_samples"
+    for stage in LATENCY_STAGES
+)
+
+
+class PlayerStats:
+    """
+    Counters written by the player process and read by the web process.
+
+    Backed by an unsynchronized shared array: the player process is the only
+    writer, and readers only need a recent value, not a consistent snapshot.
+    """
+
+    def __init__(self):
+        self._index = {name: i for i, name in enumerate(STAT_NAMES)}
+        self._values = Array("d", len(STAT_NAMES), lock=False)
+
+    def incr(self, name: str, amount: float = 1):
+        self._values[self._index[name]] += amount
+
+    def set(self, name: str, value: float):
+        self._values[self._index[name]] = value
+
+    def get(self, name: str) -> float:
+        return self._values[self._index[name]]
+
+    def reset(self):
+        for i in range(len(STAT_NAMES)):
+            self._values[i] = 0
+
+    def as_dict(self) -> dict[str, float]:
+        return {name: self._values[i] for name, i in self._index.items()}
@@ -1,2 +0,0 @@
-D18 = 18
-D10 = 19
@@ -0,0 +1,224 @@
+"""
+Precomputed feature tracks for music scenes.
+
+    python -m studio.tracks song.wav --scene 3
+
+analyzes a recording once, up front, and stores the result on the scene. When
+the scene plays, the lights are driven from the stored track on a clock, with
+the same features the live audio worker publishes (see studio.features), so no
+FFT runs during the show.
+
+The analysis works on the whole recording at once: every window is framed and
+transformed in one batch and the band volumes, RMS and log spectrum are
+computed for all windows together. Only the beat detector runs window by
+window, so offline beats match what live music sync would have detected.
+"""
+import argparse
+from dataclasses import dataclass
+import io
+import sqlite3
+import sys
+
+import numpy as np
+
+from studio.audio import SAMPLE_SIZE, BandAnalyzer, LogBands
+from studio.beats import HOP_SIZE, BeatDetector, load_wav, spectrogram
+from studio.features import N_BANDS
+
+# columns of `FeatureTrack.values`, followed by the N_BANDS spectrum bands
+COLUMNS = ("rms", "peak", "bass", "mid", "treble", "flux")
+SPECTRUM = len(COLUMNS)
+
+
+@dataclass
+class FeatureTrack:
+    # windows per second
+    hop_rate: float
+    bpm: float
+    # (n_windows, len(COLUMNS) + N_BANDS) quantized to uint8, multiply a
+    # column by its entry in `scales` to get the feature back
+    values: np.ndarray
+    scales: np.ndarray
+    # onset times in seconds
+    beats: np.ndarray
+
+    @property
+    def duration(self) -> float:
+        return len(self.values) / self.hop_rate
+
+    def to_bytes(self) -> bytes:
+        f = io.BytesIO()
+        np.savez_compressed(
+            f,
+            hop_rate=self.hop_rate,
+            bpm=self.bpm,
+            values=self.values,
+            scales=self.scales,
+            beats=self.beats,
+        )
+        return f.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "FeatureTrack":
+        with np.load(io.BytesIO(data)) as f:
+            return cls(
+                hop_rate=float(f["hop_rate"]),
+                bpm=float(f["bpm"]),
+                values=f["values"],
+                scales=f["scales"],
+                beats=f["beats"],
+            )
+
+    def features_at(self, t: float, out: np.ndarray, start: float = 0.0) -> np.ndarray:
+        """
+        Fills the `FEATURES` record `out` with the features `t` seconds into
+        the track. `start` is the monotonic() time the track started at, the
+        record's timestamps are on that clock like the live ones.
+        """
+        row = self.values[min(max(int(t * self.hop_rate), 0), len(self.values) - 1)]
+        row = row * self.scales
+
+        for column, name in enumerate(COLUMNS):
+            out[name] = row[column]
+        out["spectrum"] = row[SPECTRUM:]
+        out["bpm"] = self.bpm
+
+        beat_count = int(np.searchsorted(self.beats, t, side="right"))
+        out["beat_count"] = beat_count
+        if beat_count:
+            out["last_beat"] = start + self.beats[beat_count - 1]
+        out["captured_at"] = out["analyzed_at"] = start + t
+
+        return out
+
+
+def quantize(columns: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scales every column of a float array into 0-255. Returns the uint8 values
+    and the per column scales that undo it.
+    """
+    scales = columns.max(axis=0).astype(np.float32) / 255
+    scales[scales == 0] = 1
+    values = np.rint(columns / scales).clip(0, 255).astype(np.uint8)
+    return values, scales
+
+
+def analyze_track(
+    samples: np.ndarray,
+    sample_rate: int,
+    settings,
+    sample_size: int = SAMPLE_SIZE,
+    hop_size: int = HOP_SIZE,
+) -> FeatureTrack:
+    """
+    `settings` is a `MusicSyncSettings`, which configures the bands and the
+    beat sensitivity the same way it does for live music sync.
+    """
+    amplitudes = spectrogram(samples, sample_size, hop_size)
+    n_windows = len(amplitudes)
+    columns = np.empty((n_windows, SPECTRUM + N_BANDS), dtype=np.float32)
+
+    # raw samples of every window, for the levels
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.pad(samples, (0, max(sample_size - len(samples), 0))), sample_size
+    )[::hop_size]
+    columns[:, 0] = np.sqrt(np.mean(np.square(windows), axis=1))
+    columns[:, 1] = np.abs(windows).max(axis=1)
+
+    # band volumes, normalized per window like BandAnalyzer.analyze
+    analyzer = BandAnalyzer(settings, sample_rate, sample_size)
+    for band, (start, end) in enumerate(analyzer.bands):
+        band_amplitudes = amplitudes[:, start:end]
+        low = band_amplitudes.min(axis=1)
+        high = band_amplitudes.max(axis=1)
+        spread = high - low
+        columns[:, 2 + band] = np.divide(
+            band_amplitudes.mean(axis=1) - low,
+            spread,
+            out=np.zeros(n_windows),
+            where=spread > 0,
+        )
+
+    bands = LogBands(N_BANDS, sample_rate, sample_size)
+    spectrum = np.add.reduceat(amplitudes, bands.starts, axis=1) / bands.widths
+    columns[:, SPECTRUM:] = np.log1p(spectrum)
+
+    # onsets are inherently sequential: every threshold depends on the ones
+    # before it
+    detector = BeatDetector(
+        sample_rate / hop_size, sensitivity=settings.activation_threshold * 10
+    )
+    beats = []
+    for window_num in range(n_windows):
+        timestamp = (window_num * hop_size + sample_size) / sample_rate
+        if detector.process(amplitudes[window_num], timestamp):
+            beats.append(timestamp)
+        columns[window_num, 5] = detector.flux
+
+    values, scales = quantize(columns)
+    return FeatureTrack(
+        hop_rate=sample_rate / hop_size,
+        bpm=detector.bpm,
+        values=values,
+        scales=scales,
+        beats=np.array(beats),
+    )
+
+
+def save_track(cur: sqlite3.Cursor, scene_id: int, track: FeatureTrack):
+    cur.execute(
+        "INSERT OR REPLACE INTO scene_tracks (scene_id, track) VALUES (?, ?)",
+        (scene_id, track.to_bytes()),
+    )
+    # music scenes are played from their track
+    cur.execute(
+        """
+        UPDATE scenes SET data = json_set(data, '$.type', 'music'), version = version + 1
+        WHERE id = ?
+        """,
+        (scene_id,),
+    )
+
+
+def delete_track(cur: sqlite3.Cursor, scene_id: int):
+    cur.execute("DELETE FROM scene_tracks WHERE scene_id = ?", (scene_id,))
+
+
+def load_track(cur: sqlite3.Cursor, scene_id: int) -> FeatureTrack | None:
+    res = cur.execute(
+        "SELECT track FROM scene_tracks WHERE scene_id = ?", (scene_id,)
+    ).fetchone()
+    if res:
+        return FeatureTrack.from_bytes(res[0])
+
+    return None
+
+
+def main(argv: list[str] | None = None):
+    # imported here so the analysis can be used without the player
+    from studio import db
+
+    parser = argparse.ArgumentParser(description="Precompute the feature track of a WAV file")
+    parser.add_argument("path")
+    parser.add_argument("--scene", type=int, help="store the track on this scene")
+    parser.add_argument("--db", default=db.DB_PATH)
+    args = parser.parse_args(argv)
+
+    con = db.connect(args.db)
+    db.init_db(con)
+    settings = db.get_music_sync_settings(con.cursor())
+
+    samples, sample_rate = load_wav(args.path)
+    track = analyze_track(samples, sample_rate, settings)
+    print(
+        f"{track.duration:.1f}s, {len(track.beats)} beats, {track.bpm:.1f} bpm, "
+        f"{len(track.to_bytes()) / 1024:.0f}KB"
+    )
+
+    if args.scene is not None:
+        save_track(con.cursor(), args.scene, track)
+        con.commit()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
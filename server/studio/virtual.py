@@ -0,0 +1,118 @@
+"""
+Virtual strip backend.
+
+`VirtualStrip` keeps its pixels in a numpy array and never logs per pixel, so
+shows can be previewed and load tested without hardware. Every push can be
+recorded into a `FrameCapture`: a ring buffer of timestamped frames in a
+memory-mapped file, which the web process and tests can read back while the
+player keeps writing.
+"""
+from time import time
+
+import numpy as np
+
+# capture file header, one int64 each
+CAPACITY = 0
+NUM_LEDS = 1
+WRITTEN = 2  # total number of frames ever recorded
+HEADER_FIELDS = 3
+HEADER_SIZE = HEADER_FIELDS * 8
+
+
+class FrameCapture:
+    def __init__(self, path: str, num_leds: int = 0, capacity: int = 0):
+        """
+        Creates a capture file holding the last `capacity` frames. Without a
+        size an existing capture file is opened read only.
+        """
+        self.path = path
+        if capacity:
+            size = HEADER_SIZE + capacity * 8 + capacity * num_leds * 3
+            self._mmap = np.memmap(path, dtype=np.uint8, mode="w+", shape=(size,))
+            self._header = self._mmap[:HEADER_SIZE].view(np.int64)
+            self._header[:] = (capacity, num_leds, 0)
+        else:
+            self._mmap = np.memmap(path, dtype=np.uint8, mode="r")
+            self._header = self._mmap[:HEADER_SIZE].view(np.int64)
+            capacity = int(self._header[CAPACITY])
+            num_leds = int(self._header[NUM_LEDS])
+
+        self.capacity = capacity
+        self.num_leds = num_leds
+        timestamps_end = HEADER_SIZE + capacity * 8
+        self._timestamps = self._mmap[HEADER_SIZE:timestamps_end].view(np.float64)
+        self._frames = self._mmap[timestamps_end:].reshape(capacity, num_leds, 3)
+
+    @property
+    def written(self) -> int:
+        return int(self._header[WRITTEN])
+
+    def record(self, frame: np.ndarray, timestamp: float | None = None):
+        slot = self.written % self.capacity
+        self._frames[slot] = frame
+        self._timestamps[slot] = time() if timestamp is None else timestamp
+        self._header[WRITTEN] += 1
+
+    def read(self, count: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Returns (timestamps, frames) of the last `count` recorded frames,
+        oldest first.
+        """
+        written = self.written
+        # leave the slot the writer might be filling alone
+        available = min(written, self.capacity - 1)
+        count = available if count is None else min(count, available)
+
+        slots = np.arange(written - count, written) % self.capacity
+        timestamps = self._timestamps[slots]
+        frames = self._frames[slots]
+
+        # the writer lapped us while copying, drop what it overwrote
+        overwritten = self.written - written
+        if overwritten:
+            timestamps = timestamps[overwritten:]
+            frames = frames[overwritten:]
+
+        return timestamps, frames
+
+    def close(self):
+        self._mmap.flush()
+        del self._mmap
+
+
+class VirtualStrip:
+    """
+    Drop-in replacement for `neopixel.NeoPixel` that lives in memory.
+    """
+
+    # push_strip can hand us array slices as is
+    accepts_arrays = True
+
+    def __init__(self, length: int, capture: FrameCapture | None = None):
+        self.pixels = np.zeros((length, 3), dtype=np.uint8)
+        self.capture = capture
+        self.shows = 0
+
+    def __len__(self):
+        return len(self.pixels)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [tuple(color) for color in self.pixels[index].tolist()]
+
+        return tuple(self.pixels[index].tolist())
+
+    def __setitem__(self, index, value):
+        self.pixels[index] = value
+
+    def fill(self, color: tuple[int, int, int]):
+        self.pixels[:] = color
+
+    def show(self):
+        self.shows += 1
+        if self.capture:
+            self.capture.record(self.pixels)
+
+    def show_ranges(self, ranges: list[tuple[int, int]]):
+        # nothing to transfer, so a partial update is just a show
+        self.show()
@@ -0,0 +1,48 @@
+import wave
+
+import numpy as np
+import pytest
+
+from studio.beats import detect_beats, load_wav
+
+SAMPLE_RATE = 44100
+
+
+def write_click_track(path, bpm: float, seconds: float) -> np.ndarray:
+    """
+    Writes a 16 bit mono WAV of 10ms noise bursts at `bpm`, starting half a
+    second in. Returns the click times in seconds.
+    """
+    rng = np.random.default_rng(0)
+    click_size = int(0.01 * SAMPLE_RATE)
+    click = rng.uniform(-1, 1, click_size) * np.exp(-np.linspace(0, 5, click_size))
+
+    samples = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    times = np.arange(0.5, seconds - 0.1, 60 / bpm)
+    for t in times:
+        start = int(t * SAMPLE_RATE)
+        samples[start:start + click_size] += 0.8 * click
+
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((samples * (2**15 - 1)).astype("<i2").tobytes())
+
+    return times
+
+
+@pytest.mark.parametrize("bpm", [90, 120, 140])
+def test_click_track(tmp_path, bpm):
+    path = tmp_path / "clicks.wav"
+    times = write_click_track(path, bpm, seconds=12)
+
+    samples, sample_rate = load_wav(str(path))
+    onsets, detected_bpm = detect_beats(samples, sample_rate)
+
+    # onsets are stamped at the end of their window, so they trail the click
+    # by less than a window
+    assert len(onsets) == len(times)
+    assert np.all(onsets >= times)
+    assert np.all(onsets - times < 0.03)
+    assert detected_bpm == pytest.approx(bpm, abs=2)
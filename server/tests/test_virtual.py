@@ -0,0 +1,40 @@
+import numpy as np
+
+from studio.virtual import FrameCapture, VirtualStrip
+
+
+def test_capture_reads_back_shown_frames(tmp_path):
+    path = str(tmp_path / "capture.bin")
+    capture = FrameCapture(path, num_leds=4, capacity=8)
+    strip = VirtualStrip(4, capture)
+
+    shown = np.random.default_rng(0).integers(0, 256, size=(3, 4, 3), dtype=np.uint8)
+    for frame in shown:
+        strip[:] = frame
+        strip.show()
+
+    # read like the web process does, through its own read only mapping
+    reader = FrameCapture(path)
+    timestamps, frames = reader.read()
+    assert (reader.capacity, reader.num_leds, reader.written) == (8, 4, 3)
+    np.testing.assert_array_equal(frames, shown)
+    assert np.all(np.diff(timestamps) >= 0)
+
+    timestamps, frames = reader.read(2)
+    np.testing.assert_array_equal(frames, shown[1:])
+
+    reader.close()
+    capture.close()
+
+
+def test_capture_keeps_the_last_frames(tmp_path):
+    capture = FrameCapture(str(tmp_path / "capture.bin"), num_leds=1, capacity=4)
+    for i in range(10):
+        capture.record(np.full((1, 3), i, dtype=np.uint8), timestamp=float(i))
+
+    # one slot is left to the writer
+    timestamps, frames = capture.read()
+    np.testing.assert_array_equal(timestamps, [7.0, 8.0, 9.0])
+    np.testing.assert_array_equal(frames[:, 0, 0], [7, 8, 9])
+
+    capture.close()